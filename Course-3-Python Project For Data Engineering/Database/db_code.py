@@ -1,8 +1,21 @@
+import os
+import sys
 import sqlite3
 import pandas as pd
 
-'''Now, you can use SQLite3 to create and connect your process to a new database STAFF using the following statements.'''
-conn = sqlite3.connect('STAFF.db')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl_common.dag import Dag
+from etl_common.dtypes import describe_report, optimize_dtypes
+from etl_common.indexes import describe_plans, index_table
+from etl_common.metrics import RunMetrics
+from etl_common.query import print_query
+from etl_common.query_cache import QueryCache
+from etl_common.sqlite_loader import bulk_load, connect, merge_load
+
+'''Now, you can use SQLite3 to create and connect your process to a new database STAFF using the following statements.
+The connection itself is opened in the code execution block at the end of this file.'''
+db_name = 'STAFF.db'
+metrics_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'staff_metrics.json')  # per-phase timings of the last run
 
 '''To create a table in the database, you first need to have the attributes of the required table.
 Attributes are columns of the table. Along with their names, the knowledge of their data types are also required.
@@ -10,26 +23,55 @@ The attributes for the required tables in this lab were shared in the Lab Scenar
 Add the following statements to db_code.py to feed the required table name and attribute details for the table.'''
 table_name = 'INSTRUCTOR'
 attribute_list = ['ID', 'FNAME', 'LNAME', 'CITY', 'CCODE']
+column_types = {'ID': 'INTEGER', 'FNAME': 'TEXT', 'LNAME': 'TEXT', 'CITY': 'TEXT', 'CCODE': 'TEXT'}
+table_indexes = ['ID']  # index spec: a column name or a list of columns per index
+primary_key = ['ID']  # key of the rows for if_exists = 'merge'
 
-'''Now, to read the CSV using Pandas, you use the read_csv() function. 
+'''Now, to read the CSV using Pandas, you use the read_csv() function.
 Since this CSV does not contain headers, you can use the keys of the attribute_dict dictionary as a list to assign headers to the data.'''
 file_path = '/home/project/INSTRUCTOR.csv'
-df = pd.read_csv(file_path, names = attribute_list)
+
+def extract(file_path):
+    return pd.read_csv(file_path, names = attribute_list)
+
+'''The shared optimize_dtypes() helper downcasts ID to the smallest integer type that holds it (int8 for this file) and prints the memory used before and after.
+It would also store repetitive text columns such as CITY and CCODE as categoricals, but only in frames of at least min_category_rows (100) rows,
+so the 14-row INSTRUCTOR file keeps its text columns as they are.'''
+def compact(df):
+    df, report = optimize_dtypes(df)
+    print(describe_report(report))
+    return df
 
 '''
 The pandas library provides easy loading of its dataframes directly to the database. For this, you may use the to_sql() method of the dataframe object.
 
-However, while you load the data for creating the table, you need to be careful if a table with the same name already exists in the database. If so, and it isn't required anymore, the tables should be replaced with the one you are loading here. 
+However, while you load the data for creating the table, you need to be careful if a table with the same name already exists in the database. If so, and it isn't required anymore, the tables should be replaced with the one you are loading here.
 You may also need to append some information to an existing table. For this purpose, to_sql() function uses the argument if_exists. The possible usage of if_exists is tabulated below.
 
 Argument usage	Description
 if_exists = 'fail'	Default. The command doesn't work if a table with the same name exists in the database.
 if_exists = 'replace'	The command replaces the existing table in the database with the same name.
 if_exists = 'append'	The command appends the new data to the existing table with the same name.
-As you need to create a fresh table upon execution, add the following commands to the code. The print command is optional, but helps identify the completion of the steps of code until this point.
+if_exists = 'merge'	Not part of to_sql(). Rows are matched on primary_key: new IDs are inserted, changed rows are updated and identical rows are left alone.
+The print command is optional, but helps identify the completion of the steps of code until this point.
+
+Instead of to_sql(), the shared bulk_load() helper is used. It takes the same if_exists values, writes the rows with prepared executemany inserts in a single transaction,
+and for 'replace' loads a staging table first and swaps it in, so the INSTRUCTOR table is never empty while it is being replaced.
+With 'replace' followed by 'append', running the script twice loads everything again, and appending a row that is already there duplicates it.
+The code execution block therefore uses 'merge', handled by the shared merge_load() helper: the rows go to a temporary staging table
+and only the inserts and updates are applied to INSTRUCTOR, in one transaction, with the number of inserted, updated and unchanged rows printed.
+A refresh where a few rows of the CSV changed only writes those rows.
+After the rows are loaded, the shared index_table() helper builds the indexes of table_indexes (an index on ID, for lookups by ID) and runs ANALYZE.
 '''
-df.to_sql(table_name, conn, if_exists = 'replace', index =False)
-print('Table is ready')
+def load_to_db(df, conn, table_name, if_exists = 'replace'):
+    if if_exists == 'merge':
+        counts = merge_load(df, conn, table_name, primary_key, column_types = column_types)
+        print('Merged rows:', counts)
+    else:
+        bulk_load(df, conn, table_name, if_exists = if_exists, column_types = column_types)
+    report = index_table(conn, table_name, table_indexes)
+    for line in describe_plans(report):
+        print(line)
 
 '''
 Now that the data is uploaded to the table in the database, anyone with access to the database can retrieve this data by executing SQL queries.
@@ -37,24 +79,15 @@ Now that the data is uploaded to the table in the database, anyone with access t
 Some basic SQL queries to test this data are SELECT queries for viewing data, and COUNT query to count the number of entries.
 
 SQL queries can be executed on the data using the read_sql function in pandas.
-
-Now, run the following tasks for data retrieval on the created database.
+read_sql loads the whole result into memory before printing it, so the shared print_query() helper is used instead: it fetches the rows in fixed-size chunks through one cursor
+and prints each chunk as it arrives. Values are passed separately as params and bound to ? placeholders, and limit stops fetching after that many rows.
+Results are kept in an in-memory query cache until the next load of the table, so repeating a query such as the COUNT is answered from memory.
+Appending the row below bumps the INSTRUCTOR version, so the second COUNT query is run against the table again and shows the new total.
 '''
-# Viewing all the data in the table.
-query_statement = f"SELECT * FROM {table_name}"
-query_output = pd.read_sql(query_statement, conn)
-print(query_statement)
-print(query_output)
-# Viewing only FNAME column of data.
-query_statement = f"SELECT FNAME FROM {table_name}"
-query_output = pd.read_sql(query_statement, conn)
-print(query_statement)
-print(query_output)
-# Viewing the total number of entries in the table.
-query_statement = f"SELECT COUNT(*) FROM {table_name}"
-query_output = pd.read_sql(query_statement, conn)
-print(query_statement)
-print(query_output)
+query_cache = QueryCache()
+
+def run_query(query_statement, conn, params = (), limit = None):
+    return print_query(conn, query_statement, params, limit = limit, cache = query_cache)
 
 '''Now try appending some data to the table. Consider the following.
 a. Assume the ID is 100.
@@ -67,17 +100,51 @@ data_dict = {'ID' : [100],
             'LNAME' : ['Doe'],
             'CITY' : ['Paris'],
             'CCODE' : ['FR']}
-data_append = pd.DataFrame(data_dict)
-
-# Now use the following statement to append the data to the INSTRUCTOR table.
-data_append.to_sql(table_name, conn, if_exists = 'append', index =False)
-print('Data appended successfully')
 
 '''
-Now, repeat the COUNT query. You will observe an increase by 1 in the output of the first COUNT query and the second one.
+Code execution
+The steps run under if __name__ == "__main__": so that the functions above can be imported (for example by the benchmark suite) without touching STAFF.db.
+
+Now, run the following tasks for data retrieval on the created database.
+After appending, repeat the COUNT query. You will observe an increase by 1 in the output of the first COUNT query and the second one.
+On later runs John Doe (ID 100) is already in the table, so the merge reports him as unchanged and the count stays the same instead of growing with a duplicate.
 
 Before proceeding with the final execution, you need to add the command to close the connection to the database after all the queries are executed.
 
-Add the following line at the end of db_code.py to close the connection to the database.
+The steps are declared as the tasks of a task graph (the shared Dag from etl_common) in build_dag(): each task names the tasks whose results it takes,
+so the CSV is read while the connection is opened, and run_pipelines.py can schedule this job together with the other ETL jobs of the course.
+Tasks that only have to wait for another one (the queries for the load) list it in after.
 '''
-conn.close()
\ No newline at end of file
+def run_queries(conn):
+    # Viewing all the data in the table.
+    run_query(f"SELECT * FROM {table_name}", conn)
+    # Viewing only FNAME column of data.
+    run_query(f"SELECT FNAME FROM {table_name}", conn)
+    # Viewing the total number of entries in the table.
+    run_query(f"SELECT COUNT(*) FROM {table_name}", conn)
+
+def log_step(message, phase, rows):
+    print(message)
+
+def build_dag():
+    dag = Dag('staff', log = log_step)
+    dag.task('connect', connect, db_name, message = 'Connected to ' + db_name)
+    dag.task('extract', extract, file_path, message = 'CSV read')
+    dag.task('compact', compact, inputs = ['extract'], message = 'Dtypes optimized')
+    dag.task('load_to_db', load_to_db, inputs = {'df': 'compact', 'conn': 'connect'}, table_name = table_name, if_exists = 'merge',
+             message = 'Table is ready')
+    dag.task('run_queries', run_queries, inputs = ['connect'], after = ['load_to_db'], message = 'Queries complete')
+    # Now use the following statement to append the data to the INSTRUCTOR table.
+    dag.task('append', load_to_db, inputs = {'conn': 'connect'}, df = pd.DataFrame(data_dict), table_name = table_name, if_exists = 'merge',
+             after = ['run_queries'], message = 'Data appended successfully')
+    dag.task('count', run_query, inputs = {'conn': 'connect'}, query_statement = f"SELECT COUNT(*) FROM {table_name}", after = ['append'],
+             message = 'Count complete')
+    # Add the following task at the end of build_dag() to close the connection to the database.
+    dag.task('close', sqlite3.Connection.close, inputs = ['connect'], after = ['count'], message = 'Connection closed')
+    return dag
+
+if __name__ == "__main__":
+    # the tasks run one at a time, each measured as a phase by run_metrics
+    run_metrics = RunMetrics('staff')
+    build_dag().run(metrics = run_metrics)
+    run_metrics.write_report(metrics_file)
@@ -15,6 +15,9 @@ wget https://cf-courses-data.s3.us.cloud-object-storage.appdomain.cloud/IBMDevel
 b. Unzip the downloaded file.
 
 unzip source.zip
+
+Unzipping is optional: extract() also reads the CSV, JSON and XML members of any .zip archive in source_dir (and gzip or zstd compressed
+files such as source1.csv.gz) directly, decompressing them while they are read. See the note "Reading compressed sources" in Task 1.
 """
 
 """
@@ -25,10 +28,25 @@ To log the information correctly, you need the date and time information at the
 While glob, xml, and datetime are inbuilt features of Python, you need to install the pandas library to your IDE.
 """
 import os
+import sys
 import glob 
+import argparse
+import json
+import hashlib
 import pandas as pd 
 import xml.etree.ElementTree as ET 
-from datetime import datetime 
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl_common.archives import data_extension, data_name, list_sources, open_source, readable, source_stat
+from etl_common.dag import Dag
+from etl_common.dedup import deduplicate_frames, describe_dedup, duplicate_mask
+from etl_common.dtypes import describe_report, optimize_dtypes
+from etl_common.logger import LoggedCall, get_logger, replay_records
+from etl_common.metrics import RunMetrics
+from etl_common.transform_spec import compile_spec, load_spec
+from etl_common.validation import Schema, run_validation, validate_batch
+from etl_common.writers import output_path, read_output, write_output
 
 """
 Note that you import only the ElementTree function from the xml.etree library because you require that function to parse the data from an XML file format.
@@ -37,10 +55,14 @@ You also require two file paths that will be available globally in the code for
 
 # path of current working directry
 cwd_path = os.getcwd()
-log_file = (r"F:\DATA ENGINEERING\Course-3\ETL Pipeline\log_file.txt") 
+script_dir = os.path.dirname(os.path.abspath(__file__))
+# the JSON-lines log of the runs; log_file.txt next to it is the lab's original text log
+log_file = os.path.join(script_dir, "etl_log.txt")
 # print(os.path.abspath(log_file))
 # F:\DATA ENGINEERING\Course-3\ETL Pipeline
 target_file =(r"F:\DATA ENGINEERING\Course-3\ETL Pipeline\transformed_data.csv")
+metrics_file = os.path.join(script_dir, "etl_metrics.json")  # per-phase timings of the last run
+profile_dir = None  # set to a folder to also dump a cProfile file per phase
 # print(os.path.abspath(target_file))
 # Task 1: Extraction
 """
@@ -60,125 +82,459 @@ def extract_from_json(file_to_process):
 """
 To extract from an XML file, you need first to parse the data from the file using the ElementTree function. You can then extract relevant information from this data and append it to a pandas dataframe as follows.
 
-Note: Adding Data to DataFrames using pd.concat
-In this lab, we use pd.concat to append data to an existing DataFrame. This method is recommended because the append method is deprecated. pd.concat offers better efficiency and flexibility, especially when combining multiple DataFrames.
-
-Why use pd.concat:
-pd.concat is more efficient when adding rows or combining multiple DataFrames.
-It provides better control over the operation, allowing you to concatenate along rows or columns.
-It also includes the ignore_index=True argument, which resets the index to avoid duplication when combining DataFrames.
+Note: Streaming the XML file with iterparse
+ET.parse reads the whole document into memory before the first person can be processed, and growing a DataFrame one person at a time with pd.concat copies every earlier row again on each step, which is quadratic in the number of rows.
+Instead, ET.iterparse reads the file incrementally and reports each element as soon as its closing tag is seen. Every finished person is copied into three plain Python lists (one per column) and then cleared from the tree, so memory stays flat whatever the file size.
+Once xml_batch_size persons have been collected, the lists are turned into a DataFrame in one step and handed to the caller. extract_from_xml() simply concatenates these batches once at the end.
 
 Note: You must know the headers of the extracted data to write this function. In this data, you extract "name", "height", and "weight" headers for different persons.
 """
+xml_batch_size = 50000  # number of persons turned into one DataFrame at a time
+
+def iter_xml_batches(file_to_process, batch_size=xml_batch_size):
+    names, heights, weights = [], [], []
+    context = ET.iterparse(file_to_process, events=("start", "end"))
+    _, root = next(context)  # the first event is the start of the root element
+    for event, elem in context:
+        if event != "end" or elem.tag != "person":
+            continue
+        names.append(elem.findtext("name"))
+        heights.append(float(elem.findtext("height")))
+        weights.append(float(elem.findtext("weight")))
+        elem.clear()
+        root.clear()  # drop the finished person from the root so the tree does not grow
+        if len(names) >= batch_size:
+            yield pd.DataFrame({"name": names, "height": heights, "weight": weights})
+            names, heights, weights = [], [], []
+    if names:
+        yield pd.DataFrame({"name": names, "height": heights, "weight": weights})
 
 def extract_from_xml(file_to_process): 
-    dataframe = pd.DataFrame(columns=["name", "height", "weight"]) 
-    tree = ET.parse(file_to_process) 
-    root = tree.getroot() 
-    for person in root: 
-        name = person.find("name").text 
-        height = float(person.find("height").text) 
-        weight = float(person.find("weight").text) 
-        dataframe = pd.concat([dataframe, pd.DataFrame([{"name":name, "height":height, "weight":weight}])], ignore_index=True) 
-    return dataframe 
+    batches = list(iter_xml_batches(file_to_process, xml_batch_size))
+    if not batches:
+        return pd.DataFrame(columns=["name", "height", "weight"])
+    return pd.concat(batches, ignore_index=True)
 
 """
 Now you need a function to identify which function to call on basis of the filetype of the data file. 
 To call the relevant function, write a function extract, which uses the glob library to identify the filetype. This can be done as follows:
+
+Note: Extracting many files in parallel
+The landing directory can hold hundreds of source files per run. list_source_files() collects the CSV, JSON and XML files in the same order the lab processes them, and extract_file() calls the matching extract_from_* function based on the file extension.
+When extract_workers is greater than 1, extract() hands the files to a pool of worker processes. pool.map returns the results in the same order as the input files, and all frames are concatenated once at the end, so the output matches the sequential path.
+Starting the processes and sending the frames back costs more than it saves on small inputs (the lab's nine files take about three times longer in a pool),
+so the pool is only used when the source files add up to at least parallel_min_bytes, and never with more workers than CPUs. Set extract_workers to 1 to always process the files one after another in the current process.
+
+Note: Removing duplicates across the sources
+The same person can be delivered in more than one file and format. With deduplicate_sources set to True, extract() concatenates the files and keeps only
+the first row of every person, using the shared deduplicate_frames() helper: the names are compared with case and spacing normalized, and height and weight
+are rounded to the nearest multiple of dedup_tolerances before they are compared (values on either side of a rounding boundary stay different). The number of duplicates removed from each source file is written to the log.
+In streaming mode the duplicates are found in a first pass that spills only the keys to dedup_partitions hash partitions on disk, so memory stays bounded.
+Incremental mode keeps the rows of every file as they are, since it has to know which rows each file contributed.
+It is off by default: the lab's source1 to source3 files hold the same persons, so deduplicating them leaves 13 of the 39 rows of transformed_data.csv.
+When you turn it on, delete the validation_state file first, or the row_change rule fails the first run because the row count dropped by two thirds.
+
+Note: Reading compressed sources
+Large drops arrive compressed, and unzipping them first writes a full copy of the data to disk before extraction can start.
+With read_archives set, list_source_files() also lists the members of every .zip archive in source_dir, as "<archive>::<member>",
+and files compressed with gzip (.gz) or zstd (.zst). extract_file() opens these with the shared open_source() helper, which decompresses
+the data as the readers consume it, so nothing is unpacked to disk. The worker processes receive only the member names and each one opens
+the archive and streams its own member. A member whose file is already unpacked next to the archive (source.zip and source1.csv) is skipped, so no rows are read twice.
 """
+extract_workers = 4  # number of worker processes used by extract(); 1 runs sequentially
+parallel_min_bytes = 32 * 2 ** 20  # smaller inputs are extracted sequentially even with extract_workers > 1
+read_archives = True  # also read .zip members and .gz/.zst files in source_dir without unpacking them
+deduplicate_sources = False  # True keeps only the first row of every person found in several sources
+dedup_keys = ["name", "height", "weight"]
+dedup_tolerances = {"height": 0.01, "weight": 0.01}  # grid steps in inches and pounds; values rounding to the same multiple are the same
+dedup_partitions = 16  # spill files used to find duplicates in streaming mode
+dedup_spill_dir = None  # folder for the spill files; None uses the system temporary folder
+
 # relative file path : Course-3\ETL Pipeline\*file.extension
-def extract(): 
-    extracted_data = pd.DataFrame(columns=['name','height','weight']) # create an empty data frame to hold extracted data 
-     
-    # process all csv files, except the target file"  *.csv"
-    for csvfile in glob.glob(r"Course-3\ETL Pipeline\*.csv"): 
-        if csvfile != target_file:  # check if the file is not the target file
-            extracted_data = pd.concat([extracted_data, pd.DataFrame(extract_from_csv(csvfile))], ignore_index=True) 
-         
-    # process all json files  "*.json"
-    for jsonfile in glob.glob(r"Course-3\ETL Pipeline\*.json"):
-        extracted_data = pd.concat([extracted_data, pd.DataFrame(extract_from_json(jsonfile))], ignore_index=True) 
-     
-    # process all xml files "*.xml"
-    for xmlfile in glob.glob(r"Course-3\ETL Pipeline\*.xml"): 
-        extracted_data = pd.concat([extracted_data, pd.DataFrame(extract_from_xml(xmlfile))], ignore_index=True) 
-         
-    return extracted_data 
+source_dir = r"Course-3\ETL Pipeline"
+
+source_types = [".csv", ".json", ".xml"]
+
+def list_source_files():
+    # all csv files, except the target file, then all json files, then all xml files
+    csv_files = [f for f in glob.glob(os.path.join(source_dir, "*.csv")) if f != target_file]
+    json_files = glob.glob(os.path.join(source_dir, "*.json"))
+    xml_files = glob.glob(os.path.join(source_dir, "*.xml"))
+    files = csv_files + json_files + xml_files
+    if read_archives:
+        unpacked = {os.path.basename(f) for f in files}
+        files += [f for f in list_sources(source_dir, source_types) if data_name(f) not in unpacked]
+        # keep the csv, json, xml order; within a type the unpacked files come first
+        files.sort(key=lambda f: source_types.index(data_extension(f)))
+    return files
+
+extractors = {".csv": extract_from_csv, ".json": extract_from_json, ".xml": extract_from_xml}
+
+def extract_file(file_to_process):
+    # plain files are read from their path, archive members and compressed files through a decompressing stream
+    with readable(file_to_process) as source:
+        return pd.DataFrame(extractors[data_extension(file_to_process)](source))
+
+def extract(workers=None): 
+    if workers is None:
+        workers = extract_workers
+    workers = min(workers, os.cpu_count() or 1)
+    source_files = list_source_files()
+
+    if workers > 1 and len(source_files) > 1 and sum(source_stat(f)[0] for f in source_files) >= parallel_min_bytes:
+        with ProcessPoolExecutor(max_workers=min(workers, len(source_files))) as pool:
+            # what a worker logs comes back with its frame and is written here
+            results = list(pool.map(LoggedCall(extract_file), source_files))
+        for _, records in results:
+            replay_records(records)
+        frames = [frame for frame, _ in results]
+    else:
+        frames = [extract_file(f) for f in source_files]
+
+    if not frames:
+        # typed empty columns, so that height and weight never end up as object
+        return pd.DataFrame({'name': pd.Series(dtype=str), 'height': pd.Series(dtype=float), 'weight': pd.Series(dtype=float)})
+    if deduplicate_sources:
+        data, report = deduplicate_frames(frames, source_files, dedup_keys, dedup_tolerances)
+        log_progress(describe_dedup(report), "deduplicate", len(data))
+        return data
+    return pd.concat(frames, ignore_index=True) 
+
+"""
+Note: Validating the extracted data
+The extractors do not check what they read: a height written as text or a weight in the wrong unit would go through the transformation unnoticed.
+The extracted data is therefore checked against a declarative schema with the shared Schema helper, one whole-column operation per rule:
+the names must be present, height and weight must be numbers in a plausible range (inches and pounds), and the number of rows may not
+change by more than half since the last run that passed. The violations of every rule are logged, and a rule over its threshold
+(max_violations, 0 by default, or max_fraction of the rows) raises ValidationError before anything is transformed or loaded.
+In streaming mode every chunk is checked against the column rules as it is read.
+"""
+validation_rules = [
+    {"column": "name", "check": "not_null"},
+    {"column": "height", "check": "type", "type": "float"},
+    {"column": "height", "check": "range", "min": 0, "max": 120},
+    {"column": "weight", "check": "type", "type": "float"},
+    {"column": "weight", "check": "range", "min": 0, "max": 1000},
+    {"check": "row_change", "max": 0.5},
+]
+schema = Schema(validation_rules)
+validation_state = os.path.splitext(target_file)[0] + "_validation.json"  # row count of the last run that passed validation
+
+def validate(data):
+    return run_validation(data, schema, validation_state, log=lambda line: log_progress(line, "validate"))
+
+"""
+Note: Compacting the dtypes before the transformation
+By default every name is stored as a separate Python string and every number as 64 bits. Before the transformation, the shared optimize_dtypes() helper
+turns low-cardinality string columns such as name into categoricals and downcasts the numbers to the smallest type that holds them without losing anything.
+The memory used before and after is written to the log. Set compact_dtypes to False to keep pandas' default dtypes.
+"""
+compact_dtypes = True
+
+def compact(data):
+    data, report = optimize_dtypes(data)
+    log_progress(describe_report(report), "optimize_dtypes", len(data))
+    return data
 
 """
 Task 2 - Transformation
 The height in the extracted data is in inches, and the weight is in pounds. However, for your application, the height is required to be in meters, and the weight is required to be in kilograms, rounded to two decimal places. Therefore, you need to write the function to perform the unit conversion for the two parameters.
 The name of this function will be transform(), and it will receive the extracted dataframe as the input. Since the dataframe is in the form of a dictionary with three keys, "name", "height", and "weight", each of them having a list of values, you can apply the transform function on the entire list at one go.
-"""
 
-def transform(data): 
-    '''Convert inches to meters and round off to two decimals 
-    1 inch is 0.0254 meters '''
-    data['height'] = round(data.height * 0.0254,2) 
- 
-    '''Convert pounds to kilograms and round off to two decimals 
-    1 pound is 0.45359237 kilograms '''
-    data['weight'] = round(data.weight * 0.45359237,2) 
-    
-    return data 
+The conversions are written as a transform spec, one step per column, and compiled once with the shared compile_spec() helper.
+Each column is read once into a buffer, multiplied and rounded in place, and set back, so no temporary arrays are created.
+To change the conversions without editing the code, save the steps as a JSON list and point transform_spec_file at it.
+"""
+transform_spec = [
+    # 1 inch is 0.0254 meters, rounded off to two decimals
+    {"column": "height", "op": "multiply", "factor": 0.0254, "round": 2},
+    # 1 pound is 0.45359237 kilograms, rounded off to two decimals
+    {"column": "weight", "op": "multiply", "factor": 0.45359237, "round": 2},
+]
+transform_spec_file = None  # path of a JSON transform spec used instead of transform_spec
+transform = compile_spec(load_spec(transform_spec_file) if transform_spec_file else transform_spec)
 
 """
 Task 3 - Loading and Logging
 You need to load the transformed data to a CSV file that you can use to load to a database as per requirement.
 To load the data, you need a function load_data() that accepts the transformed data as a dataframe and the target_file path. 
 You need to use the to_csv attribute of the dataframe in the function as follows:
+
+The file is written by the shared write_output() helper. With output_format = "csv" it calls to_csv as above.
+A CSV file keeps no types, is not compressed and has to be parsed completely by every reader, so output_format can also be set to "parquet" or "feather":
+a compressed, typed columnar file (written next to target_file with the matching extension, without the pandas index) that readers can load column by column.
+output_partition_by splits a columnar output into one folder per value of the given columns. Streaming mode always appends to the CSV file.
 """
+output_format = "csv"  # "csv", "parquet" or "feather"
+output_partition_by = None  # e.g. ["name"]; only for the columnar formats
 
 def load_data(target_file, transformed_data): 
-    transformed_data.to_csv(target_file) 
+    # the incremental manifest describes the target this run replaces, so it is dropped (run_incremental() writes a new one)
+    remove_manifest(manifest_path(target_file))
+    if output_format == "csv":
+        transformed_data.to_csv(target_file) 
+    else:
+        write_output(transformed_data, output_path(target_file, output_format), output_format, partition_by=output_partition_by)
+
+"""
+Streaming mode
+extract() holds every source row in memory before transform() and load_data() run. For very large inputs the job can instead be run in streaming mode, where each file is read in fixed-size chunks:
+CSV files are read with pd.read_csv(chunksize=...), JSON-lines files with pd.read_json(lines=True, chunksize=...), and XML files with the iter_xml_batches() generator from Task 1.
+Every chunk goes through transform() and is appended to the target file straight away, so peak memory depends on chunk_size and not on the size of the input.
+The chunks are numbered with a running row index, so the file written in streaming mode is the same as the one written by load_data().
+"""
+streaming_mode = False  # True runs extract/transform/load chunk by chunk
+chunk_size = 100000  # rows per chunk in streaming mode
+
+def iter_csv_chunks(file_to_process, chunk_size=chunk_size):
+    with pd.read_csv(file_to_process, chunksize=chunk_size) as reader:
+        yield from reader
+
+def iter_json_chunks(file_to_process, chunk_size=chunk_size):
+    with pd.read_json(file_to_process, lines=True, chunksize=chunk_size) as reader:
+        yield from reader
+
+chunk_readers = {".csv": iter_csv_chunks, ".json": iter_json_chunks, ".xml": iter_xml_batches}
+
+def extract_chunks(chunk_size=chunk_size):
+    # yields (source, chunk) pairs; the source is the full path or archive::member name
+    for file_to_process in list_source_files():
+        with readable(file_to_process) as source:
+            for chunk in chunk_readers[data_extension(file_to_process)](source, chunk_size):
+                yield file_to_process, chunk
+
+def append_data(target_file, transformed_chunk, first_chunk):
+    # the first chunk replaces the target file and writes the header, later chunks are appended
+    transformed_chunk.to_csv(target_file, mode="w" if first_chunk else "a", header=first_chunk)
+
+def run_streaming(target_file, chunk_size=chunk_size):
+    remove_manifest(manifest_path(target_file))  # the target is rewritten chunk by chunk, so its incremental manifest no longer applies
+    keep = None
+    if deduplicate_sources:
+        # first pass: only the keys are read into the spill files, the rows to keep come back as a mask
+        keep, report = duplicate_mask(extract_chunks(chunk_size), dedup_keys, dedup_tolerances, dedup_partitions, dedup_spill_dir)
+        log_progress(describe_dedup(report), "deduplicate", report["rows_out"])
+    rows_read = rows_loaded = 0
+    for _, chunk in extract_chunks(chunk_size):
+        validate_batch(chunk, schema, log=lambda line: log_progress(line, "validate"))
+        if keep is not None:
+            mask = keep[rows_read:rows_read + len(chunk)]
+            rows_read += len(chunk)
+            chunk = chunk[mask]
+        chunk.index = pd.RangeIndex(rows_loaded, rows_loaded + len(chunk))
+        append_data(target_file, transform(chunk), rows_loaded == 0)
+        rows_loaded += len(chunk)
+    if rows_loaded == 0:
+        load_data(target_file, pd.DataFrame(columns=["name", "height", "weight"]))
+    return rows_loaded
+
+"""
+Incremental mode
+Each full run re-reads every source file and rewrites the target from scratch, even when only one file changed. In incremental mode a manifest is kept next to the target file.
+For every source file it records the path, size, modification time, SHA-256 content hash and the number of rows that file contributed to the target, in the order the rows appear in the target.
+On the next run, a file whose size and modification time are unchanged is skipped without being read. If only the modification time changed, the content hash decides.
+Archive members are tracked the same way, by the size and time stored in the archive and the hash of their decompressed data.
+Rows of unchanged files are taken from the existing target, new or changed files are extracted and transformed again, and rows of files that no longer exist are dropped. When nothing changed the target is left untouched.
+The manifest also records the number of rows, size, modification time and SHA-256 hash of the target it describes. Cutting the target by the stored row counts is only right
+for that exact file, so if the target was rewritten since (by a batch or streaming run, or by hand) every source file is processed again in a full rebuild.
+The target is checked like the sources, so it is only hashed when its modification time changed, and its new hash is computed while it is written rather than by reading it back.
+The existing target is only read when a file was added, changed or deleted, so a run where nothing changed reads nothing but the manifest and the file sizes and times.
+Batch and streaming runs delete the manifest whenever they write the target.
+"""
+incremental_mode = False  # True only re-processes new or changed source files
+
+def manifest_path(target_file):
+    return os.path.splitext(target_file)[0] + "_manifest.json"
+
+manifest_file = manifest_path(target_file)
+
+def hash_file(file_to_process, block_size=1 << 20):
+    # archive members and compressed files are hashed by their decompressed data
+    digest = hashlib.sha256()
+    with open_source(file_to_process) as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(file_to_process, previous=None):
+    size, mtime = source_stat(file_to_process)
+    entry = {"path": file_to_process, "size": size, "mtime": mtime}
+    if previous is not None and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+        entry["sha256"] = previous["sha256"]
+    else:
+        entry["sha256"] = hash_file(file_to_process)
+    return entry
+
+def read_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return {"files": [], "target": None}
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    manifest.setdefault("target", None)  # manifests written before the target was recorded force a full rebuild
+    return manifest
+
+def write_manifest(manifest_file, entries, target):
+    # write to a temporary file first so an interrupted run never leaves a half-written manifest
+    temp_file = manifest_file + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump({"files": entries, "target": target}, f, indent=2)
+    os.replace(temp_file, manifest_file)
+
+def remove_manifest(manifest_file):
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+
+def target_matches(output_file, target):
+    # the target is checked like the sources: by size and modification time, and only hashed when just the time changed
+    if target is None or not os.path.exists(output_file) or "size" not in target:
+        return False
+    size, mtime = source_stat(output_file)
+    if size != target["size"]:
+        return False
+    return mtime == target["mtime"] or hash_file(output_file) == target["sha256"]
+
+class HashingWriter:
+    """Text file that hashes what is written to it, so the manifest gets the target's hash without reading the file back."""
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.digest = hashlib.sha256()
+
+    def write(self, text):
+        self.digest.update(text.encode("utf-8"))
+        return self.file.write(text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+def write_target(target_file, output):
+    """load_data() that also returns the target entry of the manifest: rows, size, modification time and hash of the written file."""
+    output_file = target_file if output_format == "csv" else output_path(target_file, output_format)
+    if output_format == "csv":
+        remove_manifest(manifest_path(target_file))
+        with HashingWriter(target_file) as f:
+            output.to_csv(f)
+        sha256 = f.digest.hexdigest()
+    else:
+        load_data(target_file, output)
+        sha256 = hash_file(output_file)
+    size, mtime = source_stat(output_file)
+    return {"rows": len(output), "size": size, "mtime": mtime, "sha256": sha256}
+
+def run_incremental(target_file, manifest_file):
+    if output_partition_by:
+        raise ValueError("Incremental mode keeps the rows in source file order, it cannot write a partitioned output")
+    manifest = read_manifest(manifest_file)
+    output_file = target_file if output_format == "csv" else output_path(target_file, output_format)
+    old_entries, target = manifest["files"], manifest["target"]
+    # without the previous output, or if it is not the file the manifest describes, every file has to be processed again
+    rebuild = not target_matches(output_file, target) or sum(entry["rows"] for entry in old_entries) != target["rows"]
+    if rebuild and old_entries:
+        log_progress("Target does not match the manifest, rebuilding it from every source file", "incremental")
+    previous = {} if rebuild else {entry["path"]: entry for entry in old_entries}
+
+    # fingerprint every source first; the target is only read when there is something to merge into it
+    counts = {"unchanged": 0, "changed": 0, "new": 0, "deleted": 0}
+    entries, unchanged = [], set()
+    for file_to_process in list_source_files():
+        old_entry = previous.pop(file_to_process, None)
+        entry = file_fingerprint(file_to_process, old_entry)
+        if old_entry is not None and old_entry["sha256"] == entry["sha256"]:
+            entry["rows"] = old_entry["rows"]
+            unchanged.add(file_to_process)
+            counts["unchanged"] += 1
+        else:
+            counts["changed" if old_entry is not None else "new"] += 1
+        entries.append(entry)
+    counts["deleted"] = len(previous)  # whatever is left was not found in the landing directory
+
+    if rebuild or counts["changed"] or counts["new"] or counts["deleted"]:
+        # split the existing target into the row ranges contributed by each unchanged file
+        segments, offset = {}, 0
+        if unchanged:
+            existing = pd.read_csv(target_file, index_col=0) if output_format == "csv" else read_output(output_file)
+            for entry in old_entries:
+                segments[entry["path"]] = existing.iloc[offset:offset + entry["rows"]]
+                offset += entry["rows"]
+        frames = []
+        for entry in entries:
+            frame = segments[entry["path"]] if entry["path"] in unchanged else transform(extract_file(entry["path"]))
+            entry["rows"] = len(frame)
+            frames.append(frame)
+        output = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["name", "height", "weight"])
+        target = write_target(target_file, output)
+    write_manifest(manifest_file, entries, target)
+    return counts
 
 """
 Finally, you need to implement the logging operation to record the progress of the different operations. 
 For this operation, you need to record a message, along with its timestamp, in the log_file.
-To record the message, you need to implement a function log_progress() that accepts the log message as the argument. 
-The function captures the current date and time using the datetime function from the datetime library. The use of this function requires the definition of a date-time format, and you need to convert the timestamp to a string format using the strftime attribute. The following code creates the log operation:
+To record the message, you need to implement a function log_progress() that accepts the log message as the argument, and optionally the phase of the job and the number of rows handled.
+Opening the log file for every message is slow once messages are logged per chunk or per file, so log_progress() hands the record to the shared buffered logger from etl_common.
+The logger writes one JSON record per line (timestamp, job, phase, message, rows, elapsed) from a background thread and flushes whatever is left when the script exits.
 """
+logger = get_logger(log_file, job="etl_pipeline")
 
-def log_progress(message): 
-    timestamp_format = '%Y-%h-%d-%H:%M:%S' # Year-Monthname-Day-Hour-Minute-Second 
-    now = datetime.now() # get current timestamp 
-    timestamp = now.strftime(timestamp_format) 
-    with open(log_file,"a") as f: 
-        f.write(timestamp + ',' + message + '\n') 
+def log_progress(message, phase="", rows=None): 
+    logger.log(message, phase, rows)
+
+
+"""
+The batch run can also be described as a task graph (etl_common.dag): each step is a task that names the steps whose results it takes.
+The steps of this job form a single chain, so running the graph gives the same order as calling them one by one,
+but it lets run_pipelines.py schedule this job together with the other ETL jobs of the course.
+"""
+def build_dag():
+    dag = Dag("etl_pipeline", log=log_progress)
+    dag.task("extract", extract, message="Extract phase Ended")
+    extracted = dag.task("validate", validate, inputs=["extract"], message="Validation Ended")
+    if compact_dtypes:
+        extracted = dag.task("optimize_dtypes", compact, inputs=[extracted], message="Dtype optimization Ended")
+    dag.task("transform", transform, inputs=[extracted], message="Transform phase Ended")
+    dag.task("load_data", load_data, target_file, inputs={"transformed_data": "transform"}, message="Load phase Ended")
+    return dag
 
 
 """
 Testing ETL operations and log progress
 Now, test the functions you have developed so far and log your progress along the way. Insert the following lines into your code to complete the process.
 Note the comments on every step of the code.
+The steps are placed under if __name__ == "__main__": so that the worker processes started by extract() can import this file without running the job again.
+Each phase runs through run_metrics.track(), which records wall time, CPU time, rows in and out and bytes read and written. The report is saved to metrics_file at the end of the job.
+Run the script with --trace-memory to also record the peak memory of each phase; tracing every allocation makes the phases several times slower.
 """
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ETL of the person records in the CSV, JSON and XML sources.")
+    parser.add_argument("--trace-memory", action="store_true", help="record the peak memory of each phase (slows the job down)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Log the initialization of the ETL process
+    log_progress("ETL Job Started", "job")
+    run_metrics = RunMetrics("etl_pipeline", trace_memory=args.trace_memory, profile_dir=profile_dir)
 
+    if streaming_mode:
+        log_progress("Streaming phase Started", "streaming")
+        with run_metrics.phase("streaming") as phase:
+            rows_loaded = run_streaming(target_file)
+            phase["rows_out"] = rows_loaded
+        log_progress("Streaming phase Ended", "streaming", rows_loaded)
+        print("Rows loaded:", rows_loaded)
+    elif incremental_mode:
+        log_progress("Incremental phase Started", "incremental")
+        file_counts = run_metrics.track("incremental", run_incremental, target_file, manifest_file)
+        log_progress("Incremental phase Ended", "incremental")
+        print("Source files:", file_counts)
+    else:
+        # Extract, optimize dtypes, transform and load run as the tasks of build_dag(), one at a time, each measured by run_metrics;
+        # every task logs its end message with the number of rows it returned
+        results = build_dag().run(metrics=run_metrics)
+        print("Transformed Data")
+        print(results["transform"])
 
-# Log the initialization of the ETL process 
-log_progress("ETL Job Started")
-
-# Log the beginning of the Extraction process 
-log_progress("Extract phase Started")
-extracted_data = extract() 
- 
-# Log the completion of the Extraction process 
-log_progress("Extract phase Ended")
- 
-# Log the beginning of the Transformation process 
-log_progress("Transform phase Started")
-transformed_data = transform(extracted_data) 
-print("Transformed Data")
-print(transformed_data)
- 
-# Log the completion of the Transformation process 
-log_progress("Transform phase Ended")
- 
-# Log the beginning of the Loading process 
-log_progress("Load phase Started")
-load_data(target_file,transformed_data) 
- 
-# Log the completion of the Loading process 
-log_progress("Load phase Ended")
- 
-# Log the completion of the ETL process 
-log_progress("ETL Job Ended")
\ No newline at end of file
+    # Log the completion of the ETL process
+    log_progress("ETL Job Ended", "job")
+    run_metrics.write_report(metrics_file)
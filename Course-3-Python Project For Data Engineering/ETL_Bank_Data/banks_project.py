@@ -2,12 +2,28 @@
 # ETL Project: Top 10 Largest Banks by Market Cap
 
 import os
-from bs4 import BeautifulSoup
-import requests
-import pandas as pd
-import numpy as np
+import sys
+import argparse
+from functools import partial
 import sqlite3
-from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl_common import backfill as snapshot_backfill
+from etl_common.checkpoint import Checkpoints
+from etl_common.cleaning import clean_numeric
+from etl_common.currency import CurrencyConverter, load_rates
+from etl_common.dag import Dag
+from etl_common.dtypes import describe_report, optimize_dtypes
+from etl_common.html_tables import extract_table
+from etl_common.http_cache import HttpCache
+from etl_common.indexes import describe_plans, index_table
+from etl_common.logger import get_logger
+from etl_common.metrics import RunMetrics
+from etl_common.query import print_query
+from etl_common.query_cache import QueryCache
+from etl_common.sqlite_loader import bulk_load, connect, merge_load
+from etl_common.validation import Schema, run_validation
+from etl_common.writers import output_path, write_output
 
 # -------------------------------
 # Initialize known values
@@ -15,108 +31,195 @@ from datetime import datetime
 
 url = "https://web.archive.org/web/20230908091635/https://en.wikipedia.org/wiki/List_of_largest_banks"
 table_attribs = ["Name", "MC_USD_Billion"]
+top_banks = 10  # banks kept from the table
 csv_path = r"F:\DATA ENGINEERING\Course-3\ETL_Bank_Data\Largest_banks_data.csv"
 folder = os.path.dirname(csv_path)
 # Create DB path in the same folder
 db_name = os.path.join(folder, "Bank_Project.db")
 # db_name = "Banks.db"
 table_name = "Largest_banks"
-log_file = r"F:\DATA ENGINEERING\Course-3\ETL_Bank_Data\code_log.txt"
+script_dir = os.path.dirname(os.path.abspath(__file__))
+log_file = os.path.join(script_dir, "code_log.txt")
+metrics_file = os.path.join(script_dir, "banks_metrics.json")  # per-phase timings of the last run
+profile_dir = None  # set to a folder to also dump a cProfile file per phase
 exchange_csv = "https://cf-courses-data.s3.us.cloud-object-storage.appdomain.cloud/IBMSkillsNetwork-PY0221EN-Coursera/labs/v2/exchange_rate.csv"
+offline_mode = False  # True serves the page and exchange rates only from the local HTTP cache
+target_currencies = ["GBP", "EUR", "INR"]  # None converts into every currency in the rate file
+table_indexes = ["Name"]  # index spec of the table: a column name or a list of columns per index
+infer_indexes_from_log = True  # also index the columns the queries logged in log_file filter or sort on
+primary_key = ["Name"]
+load_mode = "merge"  # "merge" writes only the rows that changed since the last run, "replace" rewrites the table
+dag_workers = 4  # tasks of the job run at the same time; profile_dir runs them one at a time instead
+checkpoint_dir = os.path.join(script_dir, ".checkpoints")  # task outputs of each run, for --resume
+checkpoint_keep = 3  # runs whose checkpoints are kept after a successful run; None keeps them all
+output_format = "csv"  # "parquet" or "feather" writes a compressed, typed columnar file next to csv_path instead
+output_partition_by = None  # columns splitting a columnar output into one folder per value
+validation_state = os.path.join(folder, "banks_validation.json")  # row count of the last run that passed validation
+
+# fetches go through the shared on-disk cache; archive snapshots are never downloaded twice
+http_cache = HttpCache(offline=offline_mode)
 
 # -------------------------------
 # Logging function
 # -------------------------------
-def log_progress(message):
-    timestamp_format = '%Y-%h-%d-%H:%M:%S'  # Year-Monthname-Day-Hour-Minute-Second
-    now = datetime.now()
-    timestamp = now.strftime(timestamp_format)
-    with open(log_file, "a") as f:
-        f.write(timestamp + " : " + message + "\n")
+# records are buffered and written as JSON lines by the shared logger's background thread
+logger = get_logger(log_file, job="banks")
+
+def log_progress(message, phase="", rows=None):
+    logger.log(message, phase, rows)
 
 # -------------------------------
 # Extraction function
 # -------------------------------
-def extract(url, table_attribs):
-    page = requests.get(url).text
-    data = BeautifulSoup(page, "html.parser")
-
-    df = pd.DataFrame(columns=table_attribs)
-    # First "By market capitalization" table on the page
-    table = data.find("table", {"class": "wikitable"})
-    rows = table.find_all("tr")
+def parse_page(page, table_attribs):
+    # First "By market capitalization" table on the page: bank name in the 2nd cell, market cap in the 3rd.
+    # The whole table is read: a row whose market cap cannot be parsed is skipped and the next bank takes its place in the top 10.
+    df = extract_table(page, "wikitable", {table_attribs[0]: 1, table_attribs[1]: 2})
+    # "1,234.5 [1]" -> 1234.5 for the whole column; cells that are not numbers become NaN and are logged, then dropped
+    cleaned = clean_numeric(df[table_attribs[1]], first_token=True)
+    if cleaned.rejected:
+        log_progress(f"{cleaned.rejected} market cap values could not be parsed and were dropped", "extract", cleaned.rejected)
+    df[table_attribs[1]] = cleaned.values
+    return df.dropna(subset=[table_attribs[1]]).head(top_banks).reset_index(drop=True)
 
-    for row in rows[1:]:  # skip header
-        col = row.find_all("td")
-        if len(col) > 0:
-            name = col[1].get_text(strip=True)
-            mc_usd = col[2].get_text(strip=True)
-
-            # clean Market Cap column
-            mc_usd = mc_usd.replace(",", "").split()[0]
-            try:
-                mc_usd = float(mc_usd)
-            except:
-                continue
-
-            df1 = pd.DataFrame({"Name": [name], "MC_USD_Billion": [mc_usd]})
-            df = pd.concat([df, df1], ignore_index=True)
+def extract(url, table_attribs):
+    page = http_cache.fetch_text(url)
+    return parse_page(page, table_attribs)
 
-    return df.head(10)  # top 10 banks only
+# -------------------------------
+# Validation function
+# -------------------------------
+# whole-column checks on the extracted table; a broken scrape (renamed table, shifted cells, missing banks) stops the job before transform
+validation_rules = [
+    {"column": "Name", "check": "not_null"},
+    {"column": "Name", "check": "unique"},
+    {"column": "MC_USD_Billion", "check": "type", "type": "float"},
+    {"column": "MC_USD_Billion", "check": "range", "min": 0},
+    {"check": "row_count", "min": top_banks, "max": top_banks},
+]
+schema = Schema(validation_rules)
+
+def validate(df):
+    return run_validation(df, schema, validation_state, log=partial(log_progress, phase="validate"))
 # -------------------------------
 # Transformation function
 # -------------------------------
-def transform(df, exchange_csv):
-    rates = pd.read_csv(exchange_csv, index_col=0).to_dict()["Rate"]
-
-    df["MC_GBP_Billion"] = [np.round(x * rates["GBP"], 2) for x in df["MC_USD_Billion"]]
-    df["MC_EUR_Billion"] = [np.round(x * rates["EUR"], 2) for x in df["MC_USD_Billion"]]
-    df["MC_INR_Billion"] = [np.round(x * rates["INR"], 2) for x in df["MC_USD_Billion"]]
-
-    return df
+def transform(df, exchange_csv, currencies=target_currencies):
+    # the rate table is read once and cached (exchange_csv can also be the rates already loaded, as a Series);
+    # all MC_<currency>_Billion columns come from one broadcast multiply and round
+    converter = CurrencyConverter(exchange_csv, opener=http_cache.open)
+    return converter.convert(df, "MC_USD_Billion", currencies, decimals=2)
 
 # -------------------------------
 # Load functions
 # -------------------------------
 def load_to_csv(df, csv_path):
-    df.to_csv(csv_path, index=False)
+    # the shared write_output() writes CSV, or a zstd-compressed Parquet/Feather file with typed columns and row-group statistics
+    write_output(df, output_path(csv_path, output_format), output_format, partition_by=output_partition_by)
 
 def load_to_db(df, sql_connection, table_name):
-    df.to_sql(table_name, sql_connection, if_exists="replace", index=False)
+    if load_mode == "merge":
+        # keyed on the bank name: new banks are inserted, changed rows updated, banks that left the top 10 deleted
+        counts = merge_load(df, sql_connection, table_name, primary_key, delete_missing=True)
+        log_progress(f"Merged rows: {counts}", "load_to_db", counts["inserted"] + counts["updated"] + counts["deleted"])
+    else:
+        # staged load swapped in atomically, so readers never see a half-loaded table
+        bulk_load(df, sql_connection, table_name, if_exists="replace")
+    # indexes are built once the rows are in, then ANALYZE; the query plans before and after go to the log
+    report = index_table(sql_connection, table_name, table_indexes, log_file, infer_indexes_from_log)
+    for line in describe_plans(report):
+        log_progress(line, "load_to_db")
 
 # -------------------------------
 # Query function
 # -------------------------------
-def run_query(query_statement, sql_connection):
-    print(query_statement)
-    query_output = pd.read_sql(query_statement, sql_connection)
-    print(query_output)
+# results are kept in memory until the next load bumps the table's version
+query_cache = QueryCache()
+
+def run_query(query_statement, sql_connection, params=(), limit=None):
+    # the result is fetched and printed in chunks through one cursor instead of being read whole; values go in as ? parameters
+    rows = print_query(sql_connection, query_statement, params, limit=limit, cache=query_cache)
+    log_progress(query_statement, "run_query", rows)  # the logged statements are the workload indexes are inferred from
+    return rows
 
 # -------------------------------
-# Code execution
+# Backfill function
 # -------------------------------
-log_progress("Preliminaries complete. Initiating ETL process")
-
-df = extract(url, table_attribs)
-log_progress("Data extraction complete. Initiating Transformation process")
-
-df = transform(df, exchange_csv)
-log_progress("Data transformation complete. Initiating Loading process")
-
-load_to_csv(df, csv_path)
-log_progress("Data saved to CSV file")
-
-sql_connection = sqlite3.connect(db_name)
-log_progress("SQL Connection initiated")
-
-load_to_db(df, sql_connection, table_name)
-log_progress("Data loaded to Database as table. Running the query")
+history_table = table_name + "_history"
+
+def run_backfill(snapshot_urls, sql_connection, concurrency=snapshot_backfill.concurrency, workers=snapshot_backfill.workers):
+    # snapshots are fetched concurrently and parsed in worker processes, then loaded into one table with a snapshot_ts column.
+    # Market caps stay in USD: converting old snapshots with today's exchange rates would misstate them.
+    df = snapshot_backfill.backfill(snapshot_urls, http_cache.fetch_page, partial(parse_page, table_attribs=table_attribs),
+                                    concurrency=concurrency, workers=workers)
+    # every snapshot repeats the same bank names and timestamps, so the history is stored with compact dtypes
+    df, report = optimize_dtypes(df)
+    log_progress(describe_report(report), "optimize_dtypes", len(df))
+    bulk_load(df, sql_connection, history_table, if_exists="replace")
+    return df
 
-# Example queries
-run_query(f"SELECT * FROM {table_name}", sql_connection)
-run_query(f"SELECT AVG(MC_GBP_Billion) FROM {table_name}", sql_connection)
-run_query(f"SELECT Name FROM {table_name} LIMIT 5", sql_connection)
+# -------------------------------
+# Task graph
+# -------------------------------
+def run_queries(sql_connection):
+    # Example queries; without ORDER BY, SQLite may return the rows in the order of an index (the names alphabetically) instead of by market cap
+    run_query(f"SELECT * FROM {table_name} ORDER BY MC_USD_Billion DESC", sql_connection)
+    run_query(f"SELECT AVG(MC_GBP_Billion) FROM {table_name}", sql_connection)
+    run_query(f"SELECT Name FROM {table_name} ORDER BY MC_USD_Billion DESC LIMIT 5", sql_connection)
+
+def build_dag():
+    # The page and exchange_rate.csv are fetched at the same time, and the CSV file is written while the database is loaded.
+    dag = Dag("banks", log=log_progress)
+    dag.task("extract", extract, url, table_attribs, message="Data extraction complete")
+    dag.task("fetch_rates", load_rates, exchange_csv, http_cache.open, message="Exchange rates fetched")
+    dag.task("validate", validate, inputs=["extract"], message="Data validation complete")
+    dag.task("transform", transform, inputs=["validate", "fetch_rates"], message="Data transformation complete")
+    dag.task("load_to_csv", load_to_csv, csv_path, inputs=["transform"], message="Data saved to CSV file")
+    dag.task("connect", connect, db_name, message="SQL Connection initiated")
+    dag.task("load_to_db", load_to_db, table_name, inputs=["transform", "connect"], message="Data loaded to Database as table")
+    dag.task("run_query", run_queries, inputs=["connect"], after=["load_to_db"], message="Process Complete")
+    dag.task("close", sqlite3.Connection.close, inputs=["connect"], after=["run_query"], message="Server Connection closed")
+    return dag
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ETL for the top 10 largest banks by market capitalization.")
+    parser.add_argument("--backfill", nargs="+", metavar="URL", help="archived snapshot URLs to load into the history table")
+    parser.add_argument("--backfill-range", nargs=2, metavar=("START", "END"),
+                        help="load one snapshot every --every-days days between two YYYY-MM-DD dates")
+    parser.add_argument("--every-days", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=snapshot_backfill.concurrency, help="snapshot fetches in flight")
+    parser.add_argument("--workers", type=int, default=snapshot_backfill.workers, help="processes parsing snapshots")
+    parser.add_argument("--resume", action="store_true", help="continue the last run from its checkpoints")
+    parser.add_argument("--trace-memory", action="store_true", help="record the peak memory of each phase (slows the job down)")
+    return parser.parse_args(argv)
 
-log_progress("Process Complete")
-sql_connection.close()
-log_progress("Server Connection closed")
+# -------------------------------
+# Code execution
+# -------------------------------
+# the steps only run when the script is executed directly, so the functions above can be imported
+if __name__ == "__main__":
+    args = parse_args()
+    snapshot_urls = list(args.backfill or [])
+    if args.backfill_range:
+        snapshot_urls += snapshot_backfill.snapshot_urls(url, *args.backfill_range, every_days=args.every_days)
+    if snapshot_urls:
+        log_progress(f"Backfill of {len(snapshot_urls)} snapshots started", "backfill")
+        run_metrics = RunMetrics("banks_backfill", trace_memory=args.trace_memory, profile_dir=profile_dir)
+        sql_connection = sqlite3.connect(db_name)
+        df = run_metrics.track("backfill", run_backfill, snapshot_urls, sql_connection, args.concurrency, args.workers)
+        sql_connection.close()
+        log_progress(f"Backfill loaded into {history_table}", "backfill", len(df))
+        run_metrics.write_report(metrics_file)
+    else:
+        log_progress("Preliminaries complete. Initiating ETL process", "job")
+        dag = build_dag()
+        # the extracted and transformed tables are checkpointed; --resume after a failed run restores them with no fetches, the loads and queries run again
+        checkpoints = Checkpoints("banks", checkpoint_dir, resume=args.resume, keep=checkpoint_keep)
+        if profile_dir or args.trace_memory:
+            run_metrics = RunMetrics("banks", trace_memory=args.trace_memory, profile_dir=profile_dir)
+            dag.run(metrics=run_metrics, checkpoints=checkpoints)
+            run_metrics.write_report(metrics_file)
+        else:
+            # per-task timings, rows and I/O, the run's totals and the critical path of the graph
+            dag.run(max_workers=dag_workers, checkpoints=checkpoints)
+            dag.write_report(metrics_file)
@@ -31,12 +31,29 @@ datetime - The library containing the function datetime used for extracting the
 As discussed before, use the following command format in a terminal window to install the libraries.
 """
 # As per the requirement, write the commands in etl_project_gdp.py at the position specified in the code structure, to import the relevant libraries
-from bs4 import BeautifulSoup
-import requests
-import pandas as pd
-import numpy as np
+import os
+import sys
+import argparse
+from functools import partial
 import sqlite3
-from datetime import datetime 
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl_common import backfill as snapshot_backfill
+from etl_common.checkpoint import Checkpoints
+from etl_common.cleaning import clean_numeric
+from etl_common.dag import Dag
+from etl_common.dtypes import describe_report, optimize_dtypes
+from etl_common.html_tables import extract_table
+from etl_common.http_cache import HttpCache
+from etl_common.indexes import describe_plans, index_table
+from etl_common.logger import get_logger
+from etl_common.metrics import RunMetrics
+from etl_common.query import print_query
+from etl_common.query_cache import QueryCache
+from etl_common.transform_spec import compile_spec
+from etl_common.sqlite_loader import bulk_load, connect, merge_load
+from etl_common.validation import Schema, run_validation
+from etl_common.writers import output_path, write_output
 
 """
 Further, you need to initialize all the known entities. These are mentioned below:
@@ -55,7 +72,26 @@ table_attribs = ["Country", "GDP_USD_millions"]
 db_name = 'World_Economies.db'
 # db_name = r'F:\DATA ENGINEERING\Course-3\ETL_GDP_Data\World_Economies.db'
 table_name ='Countries_by_GDP'
+column_types = {"Country": "TEXT", "GDP_USD_billions": "REAL"}
+table_indexes = ["GDP_USD_billions", "Country"]  # index spec of the table: a column name or a list of columns per index
+infer_indexes_from_log = True  # also index the columns the queries logged in log_file filter or sort on
+primary_key = ["Country"]
+load_mode = "merge"  # "merge" writes only the rows that changed since the last run, "replace" rewrites the table
+dag_workers = 4  # tasks of the job run at the same time; profile_dir runs them one at a time instead
+offline_mode = False  # True serves the page only from the local HTTP cache
+
+# the archived page never changes, so it is fetched once and then served from the shared on-disk cache
+http_cache = HttpCache(offline=offline_mode)
 csv_path = r'F:\DATA ENGINEERING\Course-3\ETL_GDP_Data\Countries_by_GDP.csv'
+script_dir = os.path.dirname(os.path.abspath(__file__))
+log_file = os.path.join(script_dir, 'etl_project_log.txt')
+metrics_file = os.path.join(script_dir, 'etl_project_metrics.json')  # per-phase timings of the last run
+profile_dir = None  # set to a folder to also dump a cProfile file per phase
+checkpoint_dir = os.path.join(script_dir, '.checkpoints')  # task outputs of each run, for --resume
+checkpoint_keep = 3  # runs whose checkpoints are kept after a successful run; None keeps them all
+output_format = 'csv'  # 'parquet' or 'feather' writes a compressed, typed columnar file next to csv_path instead
+output_partition_by = None  # columns splitting a columnar output into one folder per value
+validation_state = r'F:\DATA ENGINEERING\Course-3\ETL_GDP_Data\etl_project_validation.json'  # row count of the last run that passed validation
 
 """
 Task 1: Extracting information:
@@ -64,94 +100,207 @@ Inspect the URL and note the position of the table. Note that even the images wi
 Note that there are a few entries in which the IMF estimate is shown to be '—'. Also, there is an entry at the top named 'World', which we do not require. Segregate this entry from the others because this entry does not have a hyperlink and all others in the table do. So you can take advantage of that and access only the rows for which the entry under 'Country/Terriroty' has a hyperlink associated with it.
 Note that '—' is a special character and not a general hyphen, '-'. Copy the character from the instructions here to use in the code.
 Assuming the function gets the URL and the table_attribs parameters as arguments, complete the function extract() in the code following the steps below.
+The table is read with the shared extract_table() helper: index 2 selects the third tbody, the Country column takes the text of the hyperlink in the first cell (rows without one, like 'World', are skipped),
+and the IMF estimate is taken from the third cell. The rows showing '—' are then dropped from the whole column at once.
 """
+def parse_page(page, table_attribs):
+    df = extract_table(page, 2, {table_attribs[0]: 0, table_attribs[1]: 2}, link_columns=[table_attribs[0]])
+    df = df[~df[table_attribs[1]].str.contains('—', regex=False)]
+    return df.reset_index(drop=True)
+
 def extract(url, table_attribs):
-    page = requests.get(url).text
-    data = BeautifulSoup(page ,'html.parser')
-    df = pd.DataFrame(columns=table_attribs)
-    tables = data.find_all('tbody')
-    rows = tables[2].find_all('tr')
-    for row in rows:
-        col = row.find_all('td')
-        if len(col)!=0:
-            if col[0].find('a') is not None and '—' not in col[2]:
-                data_dict = {"Country":col[0].a.contents[0], "GDP_USD_millions": col[2].contents[0]}
-                df1 = pd.DataFrame(data_dict, index=[0])
-                df = pd.concat([df,df1], ignore_index=True)
-    return df
+    page = http_cache.fetch_text(url)
+    return parse_page(page, table_attribs)
 
 """
 Task 2: Transform information
 The transform function needs to modify the ‘GDP_USD_millions’. 
 You need to cover the following points as a part of the transformation process.
 Convert the contents of the 'GDP_USD_millions' column of df dataframe from currency format to floating numbers.
+The shared clean_numeric() helper does this for the whole column at once: it drops the thousands separators and footnote markers.
+Values that cannot be parsed become NaN and their count is logged.
+The unit conversion itself is a transform spec compiled once with the shared compile_spec() helper: divide by 1000 to get billions,
+round to 2 decimals and rename the column, all in one pass over a single buffer.
 """
+gdp_spec = [{"column": "GDP_USD_millions", "op": "divide", "factor": 1000, "round": 2, "rename": "GDP_USD_billions"}]
+convert_gdp = compile_spec(gdp_spec)
+
 def transform(df):
-    GDP_list = df['GDP_USD_millions'].tolist()
-    GDP_list = df["GDP_USD_millions"].tolist()
-    GDP_list = [float("".join(x.split(','))) for x in GDP_list]
-    GDP_list = [np.round(x/1000,2) for x in GDP_list]
-    df["GDP_USD_millions"] = GDP_list
-    df=df.rename(columns = {"GDP_USD_millions":"GDP_USD_billions"})
-    return df
+    cleaned = clean_numeric(df["GDP_USD_millions"])
+    if cleaned.rejected:
+        log_progress(f"{cleaned.rejected} GDP values could not be parsed and were set to NaN", "transform", cleaned.rejected)
+    df["GDP_USD_millions"] = cleaned.values
+    return convert_gdp(df)
+
+"""
+Task 2b: Validating the transformed information
+Before anything is saved, the transformed table is checked against a declarative schema with the shared Schema helper.
+Every rule is a whole-column operation: the Country names must be present and unique, the GDP values must be non-negative numbers,
+at most 5% of them may be missing (the values clean_numeric() could not parse), the table must have a plausible number of countries,
+and the row count may not change by more than half since the last run that passed, which catches a scrape of the wrong table.
+The violations of every rule are logged; a rule over its threshold raises ValidationError and stops the job before the CSV file and the database are written.
+"""
+validation_rules = [
+    {"column": "Country", "check": "not_null"},
+    {"column": "Country", "check": "unique"},
+    {"column": "GDP_USD_billions", "check": "type", "type": "float"},
+    {"column": "GDP_USD_billions", "check": "range", "min": 0},
+    {"column": "GDP_USD_billions", "check": "not_null", "max_fraction": 0.05},
+    {"check": "row_count", "min": 100},
+    {"check": "row_change", "max": 0.5},
+]
+schema = Schema(validation_rules)
+
+def validate(df):
+    return run_validation(df, schema, validation_state, log=partial(log_progress, phase='validate'))
 
 """
 Task 3: Loading information
 Loading process for this project is two fold.
 You have to save the transformed dataframe to a CSV file. 
 For this, pass the dataframe df and the CSV file path to the function load_to_csv() and add the required statements there.
+The file is written by the shared write_output() helper. Setting output_format to 'parquet' or 'feather' saves a compressed columnar file with typed columns instead,
+so a reader can load only the columns it needs; Parquet files also keep min/max statistics per row group, which lets filtered reads skip whole groups.
 """
 def load_to_csv(df, csv_path):
-    df.to_csv(csv_path)
+    # the CSV file keeps the lab's index column; the columnar formats would only store it as a useless extra column
+    write_output(df, output_path(csv_path, output_format), output_format, index=output_format == 'csv', partition_by=output_partition_by)
 """
 You have to save the transformed dataframe as a table in the database. 
 This needs to be implemented in the function load_to_db(), which accepts the dataframe df, 
 the connection object to the SQL database conn, and the table name variable table_name to be used.
+The rows are written with the shared bulk_load() helper, which loads a staging table in one transaction and swaps it in, so the table is never empty while it is being replaced.
+With load_mode = "merge" (the default), the shared merge_load() helper is used instead: rows are matched on the Country key, and only new countries, changed estimates
+and countries no longer listed are written, in one transaction. Since IMF updates only some estimates between releases, most rows are not rewritten.
+Once the rows are in, the shared index_table() helper builds the indexes of table_indexes (the GDP filter and the Country key the next merge looks rows up by, plus the columns the queries logged by earlier runs filter on) and runs ANALYZE.
+Building the indexes after the insert is much faster than updating them row by row, and the query plans before and after are written to the log, so you can confirm that the GDP filter uses the index.
 """
 def load_to_db(df, sql_connection, table_name):
-    df.to_sql(table_name, sql_connection, if_exists='replace', index=False)
+    if load_mode == 'merge':
+        counts = merge_load(df, sql_connection, table_name, primary_key, column_types=column_types, delete_missing=True)
+        log_progress(f'Merged rows: {counts}', 'load_to_db', counts['inserted'] + counts['updated'] + counts['deleted'])
+    else:
+        bulk_load(df, sql_connection, table_name, if_exists='replace', column_types=column_types)
+    report = index_table(sql_connection, table_name, table_indexes, log_file, infer_indexes_from_log)
+    for line in describe_plans(report):
+        log_progress(line, 'load_to_db')
 
 """
 Task 4: Querying the database table
 Assuming that the appropriate query was initiated and the query statement has been passed to the function run_query(), along with the SQL connection object sql_connection and the table name variable table_name, 
 this function should run the query statement on the table and retrieve the output as a filtered dataframe. This dataframe can then be simply printed.
+Instead of loading the whole result with pd.read_sql, the shared print_query() helper fetches and prints it in chunks of rows through one cursor, so the memory used stays the same however large the table grows.
+Values such as the 100 billion threshold are passed as bound parameters (? placeholders) rather than written into the SQL text, and limit caps the number of rows fetched.
+Results are also kept in an in-memory query cache: running the same query again before the next load is answered from memory, and every load bumps the table's version, which invalidates them.
 """
-def run_query(query_statement, sql_connection):
-    print(query_statement)
-    query_output = pd.read_sql(query_statement, sql_connection)
-    print(query_output)
+gdp_threshold = 100  # billion USD
+query_cache = QueryCache()
+
+def run_query(query_statement, sql_connection, params=(), limit=None):
+    rows = print_query(sql_connection, query_statement, params, limit=limit, cache=query_cache)
+    log_progress(query_statement, 'run_query', rows)  # the logged statements are the workload indexes are inferred from
+    return rows
 
 """
 Task 5: Logging progress
 Logging needs to be done using the log_progress() funciton. 
 This function will be called multiple times throughout the execution of this code and will be asked to add a log entry in a .txt file, etl_project_log.txt. 
-The entry is supposed to be in the following format:
+The entry is written by the shared buffered logger as one JSON record per line, with the fields timestamp, job, phase, message, rows and elapsed.
+Records are kept in memory and appended to the file from a background thread, and anything still buffered is flushed when the script exits.
 """
-def log_progress(message): 
-    timestamp_format = '%Y-%h-%d-%H:%M:%S' # Year-Monthname-Day-Hour-Minute-Second 
-    now = datetime.now() # get current timestamp 
-    timestamp = now.strftime(timestamp_format) 
-    with open(r"F:\DATA ENGINEERING\Course-3\ETL_GDP_Data\etl_project_log.txt","a") as f: 
-        f.write(timestamp + ' : ' + message + '\n')
+logger = get_logger(log_file, job="gdp")
 
+def log_progress(message, phase="", rows=None): 
+    logger.log(message, phase, rows)
 
-# code execution :
 
-log_progress('Preliminaries complete. Initiating ETL process')
-df = extract(url, table_attribs)
-log_progress('Data extraction complete. Initiating Transformation process')
-df = transform(df)
-log_progress('Data transformation complete. Initiating loading process')
-load_to_csv(df, csv_path)
-log_progress('Data saved to CSV file')
-sql_connection = sqlite3.connect('World_Economies.db')
-log_progress('SQL Connection initiated.')
-load_to_db(df, sql_connection, table_name)
-log_progress('Data loaded to Database as table. Running the query')
-query_statement = f"SELECT * from {table_name} WHERE GDP_USD_billions >= 100"
-run_query(query_statement, sql_connection)
-log_progress('Process Complete.')
-sql_connection.close()
+"""
+Task 6: Backfilling history
+Since IMF releases this evaluation twice a year, older archived snapshots of the page hold the earlier estimates.
+run_backfill() takes a list of snapshot URLs (or a date range turned into one snapshot URL every few days) and fetches them concurrently with asyncio, with a limit on the number of requests in flight and retries with backoff.
+The pages are parsed in a pool of worker processes, transformed, and loaded together into the Countries_by_GDP_history table with a snapshot_ts column, so rebuilding years of history takes about as long as the slowest fetch.
+Run it from a terminal, for example:
+python etl_project_gdp.py --backfill-range 2021-01-01 2023-09-01 --every-days 182
+"""
+history_table = table_name + '_history'
+
+def parse_snapshot(page):
+    return transform(parse_page(page, table_attribs))
+
+def run_backfill(snapshot_urls, sql_connection, concurrency=snapshot_backfill.concurrency, workers=snapshot_backfill.workers):
+    df = snapshot_backfill.backfill(snapshot_urls, http_cache.fetch_page, parse_snapshot, concurrency=concurrency, workers=workers)
+    # every snapshot repeats the same countries and timestamps, so the history is stored with compact dtypes
+    df, report = optimize_dtypes(df)
+    log_progress(describe_report(report), 'optimize_dtypes', len(df))
+    bulk_load(df, sql_connection, history_table, if_exists='replace', column_types={'snapshot_ts': 'TIMESTAMP', **column_types})
+    return df
+
+"""
+Task 7: Running the job as a task graph
+The steps of the job are declared as tasks of a Dag with the results they need as inputs. The runner starts every task as soon as its inputs are ready,
+so the CSV file is written while the database is being loaded, and it records the time of every task and the critical path of the graph.
+The same graph can be combined with the graphs of the other Course-3 jobs and run in one process (see run_pipelines.py).
+The output of every task is checkpointed in checkpoint_dir (the extracted and transformed tables as Feather files), keyed by run ID and by a fingerprint of the task's inputs.
+If a later task fails, for example load_to_db on a locked database, running the script again with --resume continues that run:
+the extracted, transformed and validated tables are read back from their checkpoints instead of scraping the page again,
+while the tasks run for their side effects (the loads, the query, opening and closing the connection) always run again. Once a run has completed, --resume starts a new one.
+"""
+def run_queries(sql_connection):
+    # the largest economies first; without ORDER BY the rows would come in the ascending order of the GDP index
+    run_query(f"SELECT * from {table_name} WHERE GDP_USD_billions >= ? ORDER BY GDP_USD_billions DESC", sql_connection, (gdp_threshold,))
+
+def build_dag():
+    dag = Dag('gdp', log=log_progress)
+    dag.task('extract', extract, url, table_attribs, message='Data extraction complete')
+    dag.task('transform', transform, inputs=['extract'], message='Data transformation complete')
+    dag.task('validate', validate, inputs=['transform'], message='Data validation complete')
+    dag.task('load_to_csv', load_to_csv, csv_path, inputs=['validate'], message='Data saved to CSV file')
+    dag.task('connect', connect, db_name, message='SQL Connection initiated.')
+    dag.task('load_to_db', load_to_db, table_name, inputs=['validate', 'connect'], message='Data loaded to Database as table')
+    dag.task('run_query', run_queries, inputs=['connect'], after=['load_to_db'], message='Process Complete.')
+    dag.task('close', sqlite3.Connection.close, inputs=['connect'], after=['run_query'], message='SQL Connection closed')
+    return dag
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='ETL for the countries by GDP table.')
+    parser.add_argument('--backfill', nargs='+', metavar='URL', help='archived snapshot URLs to load into the history table')
+    parser.add_argument('--backfill-range', nargs=2, metavar=('START', 'END'),
+                        help='load one snapshot every --every-days days between two YYYY-MM-DD dates')
+    parser.add_argument('--every-days', type=int, default=182)
+    parser.add_argument('--concurrency', type=int, default=snapshot_backfill.concurrency, help='snapshot fetches in flight')
+    parser.add_argument('--workers', type=int, default=snapshot_backfill.workers, help='processes parsing snapshots')
+    parser.add_argument('--resume', action='store_true', help='continue the last run from its checkpoints')
+    parser.add_argument('--trace-memory', action='store_true', help='record the peak memory of each phase (slows the job down)')
+    return parser.parse_args(argv)
+
+# code execution :
+# the steps only run when the script is executed directly, so the functions above can be imported
+# the job runs as a task graph timed per task; with profile_dir or --trace-memory the tasks run one at a time through RunMetrics, which also records bytes, peak memory (--trace-memory) and a cProfile dump per task (profile_dir)
+
+if __name__ == "__main__":
+    args = parse_args()
+    snapshot_urls = list(args.backfill or [])
+    if args.backfill_range:
+        snapshot_urls += snapshot_backfill.snapshot_urls(url, *args.backfill_range, every_days=args.every_days)
+    if snapshot_urls:
+        log_progress(f'Backfill of {len(snapshot_urls)} snapshots started', 'backfill')
+        run_metrics = RunMetrics('gdp_backfill', trace_memory=args.trace_memory, profile_dir=profile_dir)
+        sql_connection = sqlite3.connect(db_name)
+        df = run_metrics.track('backfill', run_backfill, snapshot_urls, sql_connection, args.concurrency, args.workers)
+        sql_connection.close()
+        log_progress(f'Backfill loaded into {history_table}', 'backfill', len(df))
+        run_metrics.write_report(metrics_file)
+    else:
+        log_progress('Preliminaries complete. Initiating ETL process', 'job')
+        dag = build_dag()
+        checkpoints = Checkpoints('gdp', checkpoint_dir, resume=args.resume, keep=checkpoint_keep)
+        if profile_dir or args.trace_memory:
+            run_metrics = RunMetrics('gdp', trace_memory=args.trace_memory, profile_dir=profile_dir)
+            dag.run(metrics=run_metrics, checkpoints=checkpoints)
+            run_metrics.write_report(metrics_file)
+        else:
+            dag.run(max_workers=dag_workers, checkpoints=checkpoints)
+            dag.write_report(metrics_file)
 
 # -------------------------------------------------------------------------------------------------------------------------------
 # Code for the lab Execution
@@ -0,0 +1,132 @@
+"""
+Synthetic input generators for the benchmark suite.
+
+Every generator writes files shaped like the real inputs of the Course-3 scripts, at any number of rows:
+- source*.csv / source*.json / source*.xml person records for ETL Pipeline/etl_code.py, as files or as members of a zip archive
+- wikitable HTML pages shaped like the largest banks, GDP by country and top films pages
+- exchange_rate.csv for banks_project.py and a header-less INSTRUCTOR.csv for Database/db_code.py
+The data is random but seeded, so the same scale always produces the same files.
+"""
+import os
+import zipfile
+import tempfile
+import numpy as np
+import pandas as pd
+
+seed = 42
+first_names = ["alex", "ajay", "alice", "ravi", "joe", "jack", "tom", "tracy", "john", "simon",
+               "jacob", "cindy", "ivan", "peter", "maria", "chen", "fatima", "olga", "kenji", "nia"]
+last_names = ["Ahuja", "Chong", "Vasudevan", "Smith", "Doe", "Garcia", "Kumar", "Ivanova", "Sato", "Okafor"]
+cities = ["TORONTO", "Markham", "Chicago", "Paris", "Mumbai", "Tokyo", "Lagos", "Berlin"]
+country_codes = ["CA", "CA", "US", "FR", "IN", "JP", "NG", "DE"]
+
+
+def person_frame(rows, rng):
+    return pd.DataFrame({
+        "name": rng.choice(first_names, rows),
+        "height": np.round(rng.normal(68.0, 1.9, rows), 2),
+        "weight": np.round(rng.normal(127.0, 11.6, rows), 2),
+    })
+
+
+def write_person_xml(df, path):
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<data>\n')
+        for name, height, weight in df.itertuples(index=False, name=None):
+            f.write(f"   <person>\n      <name>{name}</name>\n      <height>{height:.2f}</height>\n"
+                    f"      <weight>{weight:.2f}</weight>\n   </person>\n")
+        f.write("</data>\n")
+
+
+def write_person_sources(directory, rows, files_per_format=3):
+    """Split rows over source1..N .csv, .json and .xml files in directory and return the file paths."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    parts = np.array_split(np.arange(rows), files_per_format * 3)
+    paths = []
+    for i, part in enumerate(parts):
+        df = person_frame(len(part), rng)
+        number, extension = i % files_per_format + 1, ("csv", "json", "xml")[i // files_per_format]
+        path = os.path.join(directory, f"source{number}.{extension}")
+        if extension == "csv":
+            df.to_csv(path, index=False)
+        elif extension == "json":
+            df.to_json(path, orient="records", lines=True)
+        else:
+            write_person_xml(df, path)
+        paths.append(path)
+    return paths
+
+
+def write_person_archive(path, rows, files_per_format=3):
+    """Write the person sources of write_person_sources() as members of one deflated zip archive and return its path."""
+    with tempfile.TemporaryDirectory() as directory:
+        sources = write_person_sources(directory, rows, files_per_format)
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for source in sources:
+                zf.write(source, os.path.basename(source))
+    return path
+
+
+def html_page(tables):
+    """Wrap table markup in a minimal wiki-like page."""
+    return "<!DOCTYPE html>\n<html><head><title>Synthetic page</title></head><body>\n" + "\n".join(tables) + "\n</body></html>\n"
+
+
+def bank_page(rows):
+    rng = np.random.default_rng(seed)
+    caps = np.sort(np.round(rng.uniform(5, 500, rows), 2))[::-1]
+    body = ["<tr><th>Rank</th><th>Bank name</th><th>Market cap<br/>(US$ billion)</th></tr>"]
+    for i, cap in enumerate(caps, start=1):
+        body.append(f'<tr><td>{i}</td><td><span class="flagicon"><img src="/flags/{i % 7}.png"/></span> '
+                    f'<a href="/wiki/Bank_{i}">Bank {i}</a></td><td>{cap:,.2f}\n</td></tr>')
+    return html_page([f'<table class="wikitable sortable"><tbody>{"".join(body)}</tbody></table>'])
+
+
+def gdp_page(rows):
+    rng = np.random.default_rng(seed)
+    gdps = np.sort(rng.integers(1_000, 27_000_000, rows))[::-1]
+    body = ["<tr><th>Country/Territory</th><th>UN region</th><th>IMF estimate</th><th>Year</th></tr>",
+            f"<tr><td>World</td><td>—</td><td>{int(gdps.sum()):,}</td><td>2023</td></tr>"]
+    for i, gdp in enumerate(gdps, start=1):
+        estimate = "—" if i % 50 == 0 else f"{int(gdp):,}"  # some economies have no IMF estimate
+        body.append(f'<tr><td><span class="flagicon"></span> <a href="/wiki/Country_{i}">Country {i}</a></td>'
+                    f"<td>Region {i % 6}</td><td>{estimate}</td><td>2023</td></tr>")
+    filler = "<table><tbody><tr><td>infobox</td></tr></tbody></table>"
+    return html_page([filler, filler, f'<table class="wikitable"><tbody>{"".join(body)}</tbody></table>'])
+
+
+def movies_page(rows):
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1920, 2023, rows)
+    body = ["<tr><th>Average Rank</th><th>Film</th><th>Year</th><th>Rotten Tomatoes' Top 100</th></tr>"]
+    for i, year in enumerate(years, start=1):
+        body.append(f"<tr><td>{i}</td><td>Film {i}</td><td>{year}</td><td>unranked</td></tr>")
+    return html_page([f"<table><tbody>{''.join(body)}</tbody></table>"])
+
+
+def write_page(path, html):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return path
+
+
+def write_exchange_rates(path):
+    rates = pd.DataFrame({"Currency": ["EUR", "GBP", "INR", "JPY", "CAD", "AUD", "CHF", "CNY"],
+                          "Rate": [0.93, 0.8, 82.95, 147.6, 1.35, 1.55, 0.89, 7.3]})
+    rates.to_csv(path, index=False)
+    return path
+
+
+def write_instructor_csv(path, rows):
+    rng = np.random.default_rng(seed)
+    cities_index = rng.integers(0, len(cities), rows)
+    df = pd.DataFrame({
+        "ID": np.arange(1, rows + 1),
+        "FNAME": rng.choice(first_names, rows),
+        "LNAME": rng.choice(last_names, rows),
+        "CITY": np.array(cities)[cities_index],
+        "CCODE": np.array(country_codes)[cities_index],
+    })
+    df.to_csv(path, index=False, header=False)
+    return path
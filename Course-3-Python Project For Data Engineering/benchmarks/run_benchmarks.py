@@ -0,0 +1,207 @@
+"""
+Offline benchmark suite for the Course-3 ETL scripts.
+
+Synthetic inputs are generated at the requested scales (see generate_data.py) and every stage of
+etl_code.py, banks_project.py, etl_project_gdp.py, db_code.py and the movies scraper is timed against them.
+The scraped pages and exchange_rate.csv are served by a local HTTP server, so no request leaves the machine.
+Results are written as JSON and compared with a saved baseline; any stage slower than the baseline by more than the tolerance is reported and the run exits with status 1.
+
+Usage:
+    python run_benchmarks.py --scales 10000 100000 --output results.json
+    python run_benchmarks.py --save-baseline baseline.json
+    python run_benchmarks.py --baseline baseline.json --tolerance 0.25
+"""
+import os
+import io
+import sys
+import json
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+course_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(course_dir)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import generate_data
+from etl_common.http_cache import HttpCache
+from etl_common.logger import get_logger
+from etl_common.metrics import RunMetrics
+from etl_common.pipelines import load_script
+default_scales = [10000, 100000]  # person / INSTRUCTOR rows
+default_html_scales = [1000, 10000]  # table rows in the generated HTML pages
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    # declare UTF-8 like the real pages do, so requests decodes the '—' placeholders correctly
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".html": "text/html; charset=utf-8"}
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def local_server(directory):
+    """Serve directory over HTTP on a free local port and yield the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_etl_pipeline(module, workdir, base_url, rows, metrics):
+    module.source_dir = os.path.join(workdir, f"persons_{rows}")
+    module.target_file = os.path.join(workdir, "transformed_data.csv")
+    generate_data.write_person_sources(module.source_dir, rows)
+    data = metrics.track("extract", module.extract, 1)
+    module.parallel_min_bytes = 0  # measure the worker pool itself, whatever the input size
+    metrics.track("extract_parallel", module.extract, module.extract_workers)
+    data = metrics.track("transform", module.transform, data)
+    metrics.track("load_data", module.load_data, module.target_file, data)
+    metrics.track("streaming", module.run_streaming, module.target_file)
+    # the same rows read from the members of source.zip instead of unpacked files
+    module.source_dir = os.path.join(workdir, f"archive_{rows}")
+    os.makedirs(module.source_dir, exist_ok=True)
+    generate_data.write_person_archive(os.path.join(module.source_dir, "source.zip"), rows)
+    metrics.track("extract_archive", module.extract, module.extract_workers)
+
+
+def bench_banks(module, workdir, base_url, rows, metrics):
+    page = generate_data.write_page(os.path.join(workdir, f"banks_{rows}.html"), generate_data.bank_page(rows))
+    rates = generate_data.write_exchange_rates(os.path.join(workdir, "exchange_rate.csv"))
+    df = metrics.track("extract", module.extract, base_url + os.path.basename(page), module.table_attribs)
+    df = metrics.track("transform", module.transform, df, base_url + os.path.basename(rates))
+    metrics.track("load_to_csv", module.load_to_csv, df, os.path.join(workdir, "Largest_banks_data.csv"))
+    with contextlib.closing(sqlite3.connect(os.path.join(workdir, "Bank_Project.db"))) as conn:
+        metrics.track("load_to_db", module.load_to_db, df, conn, module.table_name)
+        metrics.track("run_query", module.run_query, f"SELECT AVG(MC_GBP_Billion) FROM {module.table_name}", conn)
+
+
+def bench_gdp(module, workdir, base_url, rows, metrics):
+    page = generate_data.write_page(os.path.join(workdir, f"gdp_{rows}.html"), generate_data.gdp_page(rows))
+    df = metrics.track("extract", module.extract, base_url + os.path.basename(page), module.table_attribs)
+    df = metrics.track("transform", module.transform, df)
+    metrics.track("load_to_csv", module.load_to_csv, df, os.path.join(workdir, "Countries_by_GDP.csv"))
+    with contextlib.closing(sqlite3.connect(os.path.join(workdir, "World_Economies.db"))) as conn:
+        metrics.track("load_to_db", module.load_to_db, df, conn, module.table_name)
+        query = f"SELECT * from {module.table_name} WHERE GDP_USD_billions >= 100"
+        metrics.track("run_query", module.run_query, query, conn)
+
+
+def bench_instructor(module, workdir, base_url, rows, metrics):
+    path = generate_data.write_instructor_csv(os.path.join(workdir, f"INSTRUCTOR_{rows}.csv"), rows)
+    df = metrics.track("extract", module.extract, path)
+    with contextlib.closing(sqlite3.connect(os.path.join(workdir, "STAFF.db"))) as conn:
+        metrics.track("load_to_db", module.load_to_db, df, conn, module.table_name)
+        metrics.track("run_query", module.run_query, f"SELECT COUNT(*) FROM {module.table_name}", conn)
+
+
+def bench_movies(module, workdir, base_url, rows, metrics):
+    page = generate_data.write_page(os.path.join(workdir, f"movies_{rows}.html"), generate_data.movies_page(rows))
+    df = metrics.track("extract", module.extract, base_url + os.path.basename(page))
+    metrics.track("load_to_csv", module.load_to_csv, df, os.path.join(workdir, "top_50_films.csv"))
+    with contextlib.closing(sqlite3.connect(os.path.join(workdir, "Movies.db"))) as conn:
+        metrics.track("load_to_db", module.load_to_db, df, conn, module.table_name)
+
+
+benchmarks = {
+    "etl_pipeline": (bench_etl_pipeline, "scales"),
+    "banks": (bench_banks, "html_scales"),
+    "gdp": (bench_gdp, "html_scales"),
+    "instructor": (bench_instructor, "scales"),
+    "movies": (bench_movies, "html_scales"),
+}
+
+
+def run(pipelines, scales, html_scales, repeat=1):
+    """Run the benchmarks and return {"<pipeline>@<rows>": {stage: best wall seconds}}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="etl_bench_") as workdir, local_server(workdir) as base_url:
+        for name in pipelines:
+            bench, scale_kind = benchmarks[name]
+            module = load_script(name)
+            if hasattr(module, "http_cache"):
+                # a private cache that revalidates every fetch, so each run still reaches the local server
+                module.http_cache = HttpCache(cache_dir=os.path.join(workdir, "http_cache"), default_ttl=0, ttls={})
+            if hasattr(module, "logger"):
+                # log (and read the query workload) in the temporary folder instead of the scripts' own log files
+                module.log_file = os.path.join(workdir, f"{name}_log.txt")
+                module.logger = get_logger(module.log_file, job=name)
+            for rows in (scales if scale_kind == "scales" else html_scales):
+                best = {}
+                for _ in range(repeat):
+                    metrics = RunMetrics(name, trace_memory=False)
+                    with contextlib.redirect_stdout(io.StringIO()):  # run_query prints its output
+                        bench(module, workdir, base_url, rows, metrics)
+                    for phase in metrics.phases:
+                        seconds = phase["wall_seconds"]
+                        best[phase["phase"]] = min(seconds, best.get(phase["phase"], seconds))
+                results[f"{name}@{rows}"] = best
+                print(f"{name}@{rows}: " + ", ".join(f"{stage} {seconds:.4f}s" for stage, seconds in best.items()))
+            if hasattr(module, "logger"):
+                module.logger.close()  # write the buffered records while the temporary folder still exists
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return (case, stage, baseline seconds, current seconds) for every stage slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for case, stages in results.items():
+        for stage, seconds in stages.items():
+            previous = baseline.get(case, {}).get(stage)
+            if previous is not None and seconds > previous * (1 + tolerance):
+                regressions.append((case, stage, previous, seconds))
+    return regressions
+
+
+def write_results(path, results):
+    document = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Course-3 ETL scripts on synthetic data.")
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(benchmarks), default=list(benchmarks))
+    parser.add_argument("--scales", nargs="+", type=int, default=default_scales, help="person and INSTRUCTOR row counts")
+    parser.add_argument("--html-scales", nargs="+", type=int, default=default_html_scales, help="table rows in generated pages")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="baseline results to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction of the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.pipelines, args.scales, args.html_scales, args.repeat)
+    write_results(args.output, results)
+    if args.save_baseline:
+        write_results(args.save_baseline, results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for case, stage, previous, seconds in regressions:
+            print(f"REGRESSION {case} {stage}: {previous:.4f}s -> {seconds:.4f}s")
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
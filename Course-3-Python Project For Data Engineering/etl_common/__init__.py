@@ -0,0 +1,4 @@
+"""
+Shared helpers for the Course-3 ETL scripts.
+The scripts live in separate folders, so each one adds the Course-3 folder to sys.path before importing from etl_common.
+"""
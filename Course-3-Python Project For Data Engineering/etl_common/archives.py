@@ -0,0 +1,117 @@
+"""
+Reading source files straight out of compressed archives.
+
+A source is named by a string, so it can be handed to a worker process as it is:
+- a plain file, e.g. source1.csv,
+- a gzip or zstd compressed file, e.g. source1.csv.gz or source1.json.zst,
+- a member of a zip archive, written "<archive>::<member>", e.g. source.zip::source1.xml.
+list_sources() expands the archives found in a folder into their member sources, and open_source() yields a binary stream of the
+decompressed data: zip members and compressed files are decompressed as they are read, so nothing is unpacked to disk first.
+Each worker opens the archive itself and only reads its own member.
+zstd needs Python 3.14 (compression.zstd) or the zstandard package.
+"""
+import os
+import io
+import glob
+import gzip
+import zipfile
+from contextlib import contextmanager
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+separator = "::"
+compressed_extensions = (".gz", ".zst")
+
+
+def split_source(source):
+    """Return (path, member) of a source; member is None unless it is in a zip archive."""
+    path, found, member = source.partition(separator)
+    return (path, member) if found else (source, None)
+
+
+def data_name(source):
+    """File name of the data itself: the member name, or the file name without its compression extension."""
+    path, member = split_source(source)
+    name = os.path.basename(member if member is not None else path)
+    root, extension = os.path.splitext(name)
+    return root if extension.lower() in compressed_extensions else name
+
+
+def data_extension(source):
+    return os.path.splitext(data_name(source))[1].lower()
+
+
+def is_plain(source):
+    path, member = split_source(source)
+    return member is None and os.path.splitext(path)[1].lower() not in compressed_extensions
+
+
+def list_members(archive, extensions):
+    """Sources of the members of a zip archive whose data extension is in extensions, in archive order."""
+    with zipfile.ZipFile(archive) as zf:
+        return [archive + separator + info.filename for info in zf.infolist()
+                if not info.is_dir() and data_extension(info.filename) in extensions]
+
+
+def list_sources(directory, extensions):
+    """Compressed files and zip archive members in directory whose data extension is in extensions."""
+    sources = []
+    for compressed in compressed_extensions:
+        sources += [path for path in sorted(glob.glob(os.path.join(directory, "*" + compressed))) if data_extension(path) in extensions]
+    for archive in sorted(glob.glob(os.path.join(directory, "*.zip"))):
+        sources += list_members(archive, extensions)
+    return sources
+
+
+def zstd_reader(raw):
+    if zstd is not None:
+        return zstd.ZstdFile(raw)
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    raise ImportError("Reading .zst sources needs Python 3.14 or the zstandard package: pip install zstandard")
+
+
+@contextmanager
+def open_source(source):
+    """Yield a binary stream of the decompressed data of source."""
+    path, member = split_source(source)
+    if member is not None:
+        with zipfile.ZipFile(path) as zf, zf.open(member) as stream:
+            yield stream
+    elif path.lower().endswith(".gz"):
+        with gzip.open(path, "rb") as stream:
+            yield stream
+    elif path.lower().endswith(".zst"):
+        with open(path, "rb") as raw, zstd_reader(raw) as stream:
+            yield io.BufferedReader(stream) if not isinstance(stream, io.BufferedIOBase) else stream
+    else:
+        with open(path, "rb") as stream:
+            yield stream
+
+
+@contextmanager
+def readable(source):
+    """Yield what the pandas and ElementTree readers should be given: the path of a plain file, else a decompressed stream."""
+    if is_plain(source):
+        yield source
+    else:
+        with open_source(source) as stream:
+            yield stream
+
+
+def source_stat(source):
+    """(size, modification time) of a source; a member has the size of its data and the time stored in the archive."""
+    path, member = split_source(source)
+    if member is None:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(member)
+    return info.file_size, list(info.date_time)
@@ -0,0 +1,97 @@
+"""
+Concurrent multi-snapshot backfill for the scrapers.
+
+A backfill rebuilds history from many archived snapshots of the same page. The snapshots are fetched concurrently with asyncio
+(a semaphore caps the number of requests in flight, and failed fetches are retried with exponential backoff),
+then parsed in a pool of worker processes, and finally stacked into one DataFrame with a snapshot_ts column.
+The fetch function is run in a thread per request, so the scripts' cached HttpCache.fetch_page can be used as is.
+A requested snapshot date is redirected by the archive to the closest capture, so snapshot_ts is taken from the final URL the fetch reports.
+"""
+import re
+import asyncio
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from etl_common.logger import LoggedCall, replay_records
+
+concurrency = 8  # fetches in flight at once
+retries = 3  # extra attempts per snapshot
+backoff = 1.0  # seconds before the first retry, doubled on every further retry
+workers = 4  # processes parsing the pages
+
+archive_pattern = re.compile(r"https?://web\.archive\.org/web/(\d{8,14})[a-z_]*/(.+)")
+
+
+def original_url(url):
+    """Return the archived page address of a web.archive.org snapshot URL, or the URL itself."""
+    match = archive_pattern.match(url)
+    return match.group(2) if match else url
+
+
+def snapshot_timestamp(url):
+    """Return the timestamp encoded in a web.archive.org snapshot URL, or None."""
+    match = archive_pattern.match(url)
+    if match is None:
+        return None
+    digits = match.group(1).ljust(14, "0")
+    return datetime.strptime(digits, "%Y%m%d%H%M%S")
+
+
+def snapshot_urls(url, start, end, every_days=30):
+    """Return one snapshot URL per every_days days from start to end (dates as 'YYYY-MM-DD'); the archive redirects each to the closest capture."""
+    page = original_url(url)
+    day, last = datetime.strptime(start, "%Y-%m-%d"), datetime.strptime(end, "%Y-%m-%d")
+    urls = []
+    while day <= last:
+        urls.append(f"https://web.archive.org/web/{day:%Y%m%d}/{page}")
+        day += timedelta(days=every_days)
+    return urls
+
+
+async def fetch_all(urls, fetch, concurrency=concurrency, retries=retries, backoff=backoff):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(url):
+        async with limit:
+            for attempt in range(retries + 1):
+                try:
+                    return await asyncio.to_thread(fetch, url)
+                except Exception:
+                    if attempt == retries:
+                        raise
+                await asyncio.sleep(backoff * 2 ** attempt)
+
+    return await asyncio.gather(*(fetch_one(url) for url in urls))
+
+
+def fetch_snapshots(urls, fetch, concurrency=concurrency, retries=retries, backoff=backoff):
+    """Fetch every URL with fetch(url) concurrently and return the pages in the order of urls."""
+    return asyncio.run(fetch_all(urls, fetch, concurrency, retries, backoff))
+
+
+def parse_snapshots(pages, parse, workers=workers):
+    """
+    Run parse(page) over the pages in worker processes; parse must be a module-level function (or a partial of one).
+    What parse logs in a worker is written by this process's loggers.
+    """
+    if workers <= 1 or len(pages) <= 1:
+        return [parse(page) for page in pages]
+    with ProcessPoolExecutor(max_workers=min(workers, len(pages))) as pool:
+        results = list(pool.map(LoggedCall(parse), pages))
+    for _, records in results:
+        replay_records(records)
+    return [frame for frame, _ in results]
+
+
+def backfill(urls, fetch, parse, concurrency=concurrency, workers=workers, retries=retries, backoff=backoff):
+    """
+    Fetch and parse every snapshot and return one DataFrame with a snapshot_ts column (ISO timestamp of the capture).
+    fetch(url) returns the page, or (page, final URL) so the timestamp is that of the capture the request was redirected to.
+    """
+    results = fetch_snapshots(urls, fetch, concurrency, retries, backoff)
+    results = [result if isinstance(result, tuple) else (result, url) for url, result in zip(urls, results)]
+    frames = parse_snapshots([page for page, _ in results], parse, workers)
+    for (_, final_url), frame in zip(results, frames):
+        timestamp = snapshot_timestamp(final_url)
+        frame.insert(0, "snapshot_ts", timestamp.isoformat(sep=" ") if timestamp else final_url)
+    return pd.concat(frames, ignore_index=True)
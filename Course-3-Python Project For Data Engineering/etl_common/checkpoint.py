@@ -0,0 +1,164 @@
+"""
+Checkpointed task outputs, so a failed job can be resumed without fetching its sources again.
+
+Every run of a job gets a run ID and a folder <checkpoint_dir>/<job>/<run ID>/. Each task of its Dag (see dag.py) that returns a DataFrame or Series
+has its output written there as a Feather file (the Arrow columnar format: fast to write and read back with the dtypes intact),
+and every completed task is recorded in the folder's manifest.json with its input fingerprint.
+The input fingerprint of a task is a hash of its function (name and bytecode), its fixed arguments, and the output fingerprints of the tasks it depends on;
+the output fingerprint of a checkpointed task is the hash of its file, so a changed page changes the fingerprint of every task downstream of the extract.
+Checkpoints(job, resume=True) continues the most recent run instead, unless that run completed, in which case a new run starts:
+a task whose fingerprint matches its manifest entry is not run again, its output is read back from the file.
+Only DataFrame and Series outputs are checkpointed. Tasks that return anything else always run: None (loads, queries, closing a connection,
+which are run for their side effects) or results that cannot be stored, such as database connections.
+The tasks that take such a result as an input always run as well (see Dag.run_task()).
+After a run succeeds, only the keep most recent runs of the job are kept; a failed run is never pruned, since it is the one to resume.
+Without pyarrow the outputs are pickled instead.
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+course_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+checkpoint_dir = os.path.join(course_dir, ".checkpoints")
+keep_runs = 3  # runs kept per job after a successful run; None keeps every run
+
+
+def describe(value):
+    """Stable text for fingerprinting a task argument: functions by name and bytecode, frames by content, the rest by repr."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return hashlib.sha256(pd.util.hash_pandas_object(value).to_numpy().tobytes()).hexdigest()
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(describe(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key!r}: {describe(item)}" for key, item in sorted(value.items(), key=lambda item: repr(item[0]))) + "}"
+    func = getattr(value, "__func__", value)  # bound methods, e.g. http_cache.open, have a new repr per object
+    if callable(func) and hasattr(func, "__qualname__"):
+        code = getattr(func, "__code__", None)
+        body = hashlib.sha256(code.co_code + repr(code.co_names).encode()).hexdigest() if code else ""
+        return f"{getattr(func, '__module__', '')}.{func.__qualname__}:{body}:{describe(getattr(func, '__defaults__', None))}"
+    return repr(value)
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_frame(df, path):
+    if pa is not None:
+        feather.write_feather(pa.Table.from_pandas(df), path)
+    else:
+        df.to_pickle(path)
+
+
+def read_frame(path):
+    if pa is not None:
+        return feather.read_table(path).to_pandas()
+    return pd.read_pickle(path)
+
+
+def storable(result):
+    """True for the task results that are checkpointed: DataFrames and Series."""
+    return isinstance(result, (pd.DataFrame, pd.Series))
+
+
+def read_manifest(run_dir):
+    with open(os.path.join(run_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def list_runs(job_dir):
+    """Run IDs of a job that have a manifest, oldest first."""
+    if not os.path.isdir(job_dir):
+        return []
+    return sorted(run_id for run_id in os.listdir(job_dir) if os.path.exists(os.path.join(job_dir, run_id, "manifest.json")))
+
+
+def prune_runs(job_dir, keep=keep_runs):
+    """Delete all but the keep most recent runs of a job and return the deleted run IDs."""
+    if keep is None:
+        return []
+    runs = list_runs(job_dir)
+    deleted = runs[:max(len(runs) - keep, 0)]
+    for run_id in deleted:
+        shutil.rmtree(os.path.join(job_dir, run_id), ignore_errors=True)
+    return deleted
+
+
+class Checkpoints:
+    def __init__(self, job, directory=checkpoint_dir, resume=False, keep=keep_runs):
+        """resume continues the most recent run of job; without a previous run, or if it completed, it starts a new one."""
+        self.job_dir = os.path.join(directory, job)
+        runs = list_runs(self.job_dir) if resume else []
+        if runs and read_manifest(os.path.join(self.job_dir, runs[-1]))["completed"]:
+            runs = []  # nothing to resume
+        self.resumed = bool(runs)
+        self.run_id = runs[-1] if runs else datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        self.run_dir = os.path.join(self.job_dir, self.run_id)
+        self.keep = keep
+        self.lock = threading.Lock()
+        if self.resumed:
+            self.manifest = read_manifest(self.run_dir)
+        else:
+            os.makedirs(self.run_dir, exist_ok=True)
+            self.manifest = {"job": job, "run_id": self.run_id, "created": datetime.now().isoformat(timespec="seconds"),
+                             "completed": False, "tasks": {}}
+            self.write_manifest()
+
+    def write_manifest(self):
+        path = os.path.join(self.run_dir, "manifest.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def fingerprint(self, task, dependency_fingerprints):
+        """Input fingerprint of a Task, given the output fingerprints of task.dependencies in order."""
+        text = "\n".join([describe(task.func), describe(task.args), describe(task.kwargs), describe(task.inputs), *dependency_fingerprints])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def restore(self, name, fingerprint):
+        """Return (result, output fingerprint) of a task completed in the resumed run with the same input fingerprint, else None."""
+        entry = self.manifest["tasks"].get(name)
+        if not self.resumed or entry is None or entry["file"] is None or entry["fingerprint"] != fingerprint:
+            return None
+        result = read_frame(os.path.join(self.run_dir, entry["file"]))
+        if entry["kind"] == "series":
+            result = result.iloc[:, 0]
+        return result, entry["output"]
+
+    def save(self, name, fingerprint, result):
+        """Checkpoint the result of a task and return its output fingerprint."""
+        if not storable(result):
+            return fingerprint  # the task runs again on resume
+        kind = "series" if isinstance(result, pd.Series) else "frame"
+        frame = result.to_frame() if kind == "series" else result
+        file_name = name.replace(os.sep, "_") + (".feather" if pa is not None else ".pkl")
+        path = os.path.join(self.run_dir, file_name)
+        write_frame(frame, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        output, rows = file_hash(path), len(frame)
+        with self.lock:
+            self.manifest["tasks"][name] = {"fingerprint": fingerprint, "output": output, "file": file_name, "kind": kind,
+                                            "rows": rows, "written": datetime.now().isoformat(timespec="seconds")}
+            self.write_manifest()
+        return output
+
+    def finish(self):
+        """Mark the run completed and prune the older runs."""
+        with self.lock:
+            self.manifest["completed"] = True
+            self.write_manifest()
+        return prune_runs(self.job_dir, self.keep)
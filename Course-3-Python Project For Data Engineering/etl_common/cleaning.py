@@ -0,0 +1,50 @@
+"""
+Vectorized cleaning of numbers scraped as text.
+
+clean_numeric() turns a whole column of strings like "26,854,599", "1,234.5 [n 1]" or "—" into floats with pandas string operations:
+footnote markers are removed, thousands separators dropped, placeholders such as the em-dash become NaN,
+and the values can be scaled between units (millions -> billions) and rounded in one array operation.
+Text that still is not a number becomes NaN as well and is counted as rejected, so callers can log it instead of losing rows silently.
+"""
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+placeholders = ("—", "–", "-", "", "N/A", "n/a")  # cells meaning "no value"
+footnote_pattern = r"\[[^\]]*\]"  # [1], [n 1], [note 2], ...
+units = {"ones": 1, "thousands": 10 ** 3, "millions": 10 ** 6, "billions": 10 ** 9, "trillions": 10 ** 12}
+
+# values: the float column; missing: cells that were empty or a placeholder; rejected: cells that could not be parsed
+CleanResult = namedtuple("CleanResult", ["values", "missing", "rejected"])
+
+
+def scale_values(values, from_unit, to_unit):
+    """Convert values between two of the units above, dividing when the target unit is larger so 1234 millions gives exactly 1.234 billions."""
+    if units[to_unit] >= units[from_unit]:
+        return values / (units[to_unit] // units[from_unit])
+    return values * (units[from_unit] // units[to_unit])
+
+
+def clean_numeric(column, thousands=",", from_unit=None, to_unit=None, decimals=None, first_token=False,
+                  placeholders=placeholders):
+    """
+    Parse a column of numeric strings and return a CleanResult.
+    first_token keeps only the text before the first whitespace (for cells like "432.92 (2023)").
+    from_unit/to_unit scale the values (for example "millions" -> "billions"); decimals rounds the result.
+    """
+    original_missing = column.isna()
+    text = column.astype("string").str.replace(footnote_pattern, "", regex=True)
+    if thousands:
+        text = text.str.replace(thousands, "", regex=False)
+    text = text.str.replace("[\xa0\u202f]", "", regex=True).str.strip()  # non-breaking spaces used as digit group separators
+    if first_token:
+        text = text.str.split(n=1).str[0].fillna("")
+    missing = original_missing | text.isin(placeholders)
+
+    values = pd.to_numeric(text.mask(missing), errors="coerce").astype(float)
+    rejected = values.isna() & ~missing
+    if from_unit and to_unit:
+        values = scale_values(values, from_unit, to_unit)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    return CleanResult(values, int(missing.sum()), int(rejected.sum()))
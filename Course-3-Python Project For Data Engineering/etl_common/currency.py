@@ -0,0 +1,56 @@
+"""
+Vectorized multi-currency conversion.
+
+The rate table (a CSV with Currency and Rate columns, like exchange_rate.csv) is loaded once per source and kept in memory for later calls.
+A converter can also be given the rates directly, as a Series indexed by currency (what load_rates() returns).
+CurrencyConverter.convert() multiplies the amount column by all requested rates in one broadcast (rows x currencies) array operation,
+rounds the whole result array in place and attaches the new columns to the DataFrame in a single step.
+"""
+import numpy as np
+import pandas as pd
+
+_rate_tables = {}
+
+
+def load_rates(source, opener=None):
+    """Return the rates of source as a Series indexed by currency, reading the file only on first use."""
+    if source not in _rate_tables:
+        table = pd.read_csv(opener(source) if opener else source, index_col=0)
+        _rate_tables[source] = table["Rate"].astype(float)
+    return _rate_tables[source]
+
+
+def clear_rate_cache():
+    _rate_tables.clear()
+
+
+class CurrencyConverter:
+    def __init__(self, rates_source, opener=None):
+        """opener turns rates_source into something pd.read_csv accepts, for example HttpCache.open for URLs."""
+        if isinstance(rates_source, pd.Series):
+            self.rates = rates_source.astype(float)
+        else:
+            self.rates = load_rates(rates_source, opener)
+
+    def column_names(self, source_column, currencies):
+        # MC_USD_Billion -> MC_GBP_Billion, ...; columns without "USD" get a currency suffix
+        if "USD" in source_column:
+            return [source_column.replace("USD", currency) for currency in currencies]
+        return [f"{source_column}_{currency}" for currency in currencies]
+
+    def convert(self, df, source_column, currencies=None, decimals=2):
+        """
+        Add one converted column per currency to df and return it.
+        currencies defaults to every currency in the rate table; unknown currencies raise KeyError.
+        """
+        currencies = list(self.rates.index) if currencies is None else list(currencies)
+        missing = [currency for currency in currencies if currency not in self.rates.index]
+        if missing:
+            raise KeyError(f"No exchange rate for {', '.join(missing)}")
+        rates = self.rates.loc[currencies].to_numpy()
+        amounts = df[source_column].to_numpy(dtype=float)
+        converted = np.multiply.outer(amounts, rates)
+        np.round(converted, decimals, out=converted)
+        names = self.column_names(source_column, currencies)
+        df = df.drop(columns=[name for name in names if name in df.columns])
+        return pd.concat([df, pd.DataFrame(converted, columns=names, index=df.index)], axis=1)
@@ -0,0 +1,215 @@
+"""
+Dependency-aware task runner for the ETL jobs.
+
+A Dag holds the steps of a job as tasks. A task calls a function with the results of its input tasks as the leading positional arguments,
+followed by its own fixed arguments, and can also wait for tasks whose result it does not need (after=...):
+    dag = Dag("banks", log=log_progress)
+    dag.task("extract", extract, url, table_attribs)
+    dag.task("transform", transform, exchange_csv, inputs=["extract"])
+inputs can also be a dict {parameter name: task name} for functions that take the result as a keyword argument.
+Tasks can only depend on tasks declared before them, so a Dag is always acyclic and its declaration order is a valid sequential order.
+run() starts every task as soon as its dependencies are done, on a thread pool, so independent steps (two fetches, the CSV and database writes) overlap,
+and the end-to-end time approaches the critical path: the longest chain of dependent tasks. If a task fails, no new task is started and the error is raised.
+Dag.combine() merges the Dags of several jobs into one, so all pipelines can be scheduled in one process.
+Every task is timed (start and end offsets, wall and thread CPU time, rows in and out, bytes read and written); report() and write_report() give the timings,
+the critical path and the run's totals of bytes read and written and peak memory, so a threaded run records the same fields as RunMetrics (see metrics.py).
+The I/O counters are process-wide, so a task that overlapped another one gets no bytes of its own; its I/O is only in the run's totals.
+run(checkpoints=Checkpoints(...)) writes the task outputs to checkpoint files and, when resuming, skips the tasks already completed (see checkpoint.py).
+Only tasks returning a DataFrame or Series are restored; the others, and every task that takes one of their results (a connection) as an input, always run.
+"""
+import json
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from etl_common.checkpoint import storable
+from etl_common.metrics import count_rows, io_counters, peak_rss
+
+workers = 4  # tasks running at the same time
+
+
+class Task:
+    def __init__(self, name, func, args, kwargs, inputs, after, message, log):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.inputs = dict(inputs) if isinstance(inputs, dict) else list(inputs)
+        self.after = list(after)
+        self.message = message
+        self.log = log
+
+    @property
+    def input_tasks(self):
+        return list(self.inputs.values()) if isinstance(self.inputs, dict) else self.inputs
+
+    @property
+    def dependencies(self):
+        return list(dict.fromkeys(self.input_tasks + self.after))
+
+    def call(self, results):
+        if isinstance(self.inputs, dict):
+            return self.func(*self.args, **{key: results[name] for key, name in self.inputs.items()}, **self.kwargs)
+        return self.func(*(results[name] for name in self.inputs), *self.args, **self.kwargs)
+
+    def renamed(self, prefix):
+        """Copy of the task with prefix added to its own and its dependencies' names."""
+        inputs = ({key: prefix + name for key, name in self.inputs.items()} if isinstance(self.inputs, dict)
+                  else [prefix + name for name in self.inputs])
+        return Task(prefix + self.name, self.func, self.args, self.kwargs, inputs, [prefix + name for name in self.after],
+                    self.message, self.log)
+
+
+class Dag:
+    def __init__(self, name, log=None):
+        """log(message, phase, rows) is called when each task finishes, e.g. a script's log_progress."""
+        self.name = name
+        self.log = log
+        self.tasks = {}
+        self.timings = {}
+        self.results = {}
+        self.fingerprints = {}
+        self.unstored = set()  # tasks whose result was not checkpointed
+        self.checkpoints = None
+        self.started = None
+        self.wall_seconds = None
+        self.totals = {}
+
+    def task(self, name, func, *args, inputs=(), after=(), message=None, **kwargs):
+        """Declare a task; message replaces the default '<name> finished' log message. Returns name."""
+        return self.add(Task(name, func, args, kwargs, inputs, after, message, self.log))
+
+    def add(self, task):
+        if task.name in self.tasks:
+            raise ValueError(f"Task '{task.name}' is already declared in {self.name}")
+        unknown = [dependency for dependency in task.dependencies if dependency not in self.tasks]
+        if unknown:
+            raise ValueError(f"Task '{task.name}' depends on undeclared task(s) {unknown}")
+        self.tasks[task.name] = task
+        return task.name
+
+    def run_task(self, task, origin):
+        read_before, written_before = io_counters()
+        start, cpu = time.perf_counter(), time.thread_time()
+        restored = None
+        if self.checkpoints is not None:
+            fingerprint = self.checkpoints.fingerprint(task, [self.fingerprints[name] for name in task.dependencies])
+            # a task working on an unstored result, such as a connection opened in this run, has its side effects to redo
+            if not any(name in self.unstored for name in task.input_tasks):
+                restored = self.checkpoints.restore(task.name, fingerprint)
+        if restored is not None:
+            result, self.fingerprints[task.name] = restored
+        else:
+            result = task.call(self.results)
+            if self.checkpoints is not None:
+                self.fingerprints[task.name] = self.checkpoints.save(task.name, fingerprint, result)
+                if not storable(result) or any(name in self.unstored for name in task.input_tasks):
+                    self.unstored.add(task.name)
+        end = time.perf_counter()
+        read_after, written_after = io_counters()
+        rows = count_rows(result)
+        rows_in = [count_rows(self.results[name]) for name in task.input_tasks]
+        rows_in = [count for count in rows_in if count is not None]
+        self.timings[task.name] = {
+            "task": task.name,
+            "start": round(start - origin, 6),
+            "end": round(end - origin, 6),
+            "wall_seconds": round(end - start, 6),
+            "cpu_seconds": round(time.thread_time() - cpu, 6),
+            "rows_in": sum(rows_in) if rows_in else None,
+            "rows_out": rows,
+            "bytes_read": None if read_before is None else read_after - read_before,
+            "bytes_written": None if written_before is None else written_after - written_before,
+            "thread": threading.current_thread().name,
+            "resumed": restored is not None,
+        }
+        if task.log is not None and restored is not None:
+            task.log(f"{task.name} restored from checkpoint {self.checkpoints.run_id}", task.name, rows)
+        elif task.log is not None:
+            task.log(task.message or f"{task.name} finished", task.name, rows)
+        return result
+
+    def run(self, max_workers=workers, metrics=None, checkpoints=None):
+        """
+        Run every task and return {task name: result}.
+        With metrics (a RunMetrics) or max_workers=1 the tasks run one at a time in declaration order, each inside metrics.phase(),
+        since RunMetrics' memory and I/O counters are process-wide and only mean something for one task at a time.
+        With checkpoints (a Checkpoints), task outputs are checkpointed and tasks completed in a resumed run are restored instead of run.
+        """
+        self.results, self.timings, self.fingerprints, self.unstored = {}, {}, {}, set()
+        self.checkpoints = checkpoints
+        self.started = datetime.now().isoformat(timespec="seconds")
+        read_before, written_before = io_counters()
+        origin = time.perf_counter()
+        if metrics is not None or max_workers <= 1:
+            for task in self.tasks.values():
+                if metrics is None:
+                    self.results[task.name] = self.run_task(task, origin)
+                    continue
+                with metrics.phase(task.name) as record:
+                    self.results[task.name] = self.run_task(task, origin)
+                    record["rows_in"], record["rows_out"] = self.timings[task.name]["rows_in"], self.timings[task.name]["rows_out"]
+        else:
+            pending, running = dict(self.tasks), {}
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.name) as pool:
+                while pending or running:
+                    for name, task in list(pending.items()):
+                        if all(dependency in self.results for dependency in task.dependencies):
+                            running[pool.submit(self.run_task, task, origin)] = name
+                            del pending[name]
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if future.exception() is not None:
+                            pending.clear()  # start nothing new; the tasks already running are waited for
+                            raise future.exception()
+                        self.results[name] = future.result()
+        self.wall_seconds = round(time.perf_counter() - origin, 6)
+        read_after, written_after = io_counters()
+        self.totals = {
+            "bytes_read": None if read_before is None else read_after - read_before,
+            "bytes_written": None if written_before is None else written_after - written_before,
+            "peak_rss_bytes": peak_rss(),
+        }
+        for timing in self.timings.values():
+            if any(other is not timing and other["start"] < timing["end"] and timing["start"] < other["end"] for other in self.timings.values()):
+                timing["bytes_read"] = timing["bytes_written"] = None
+        if checkpoints is not None:
+            checkpoints.finish()
+        return self.results
+
+    def critical_path(self):
+        """Return (seconds, [task names]) of the longest chain of dependent tasks in the last run."""
+        longest = {}
+        for task in self.tasks.values():
+            seconds = self.timings.get(task.name, {}).get("wall_seconds", 0)
+            before = max((longest[name] for name in task.dependencies), default=(0, []), key=lambda path: path[0])
+            longest[task.name] = (before[0] + seconds, before[1] + [task.name])
+        seconds, path = max(longest.values(), default=(0, []), key=lambda path: path[0])
+        return round(seconds, 6), path
+
+    def report(self):
+        seconds, path = self.critical_path()
+        return {
+            "job": self.name,
+            "run_id": self.checkpoints.run_id if self.checkpoints is not None else None,
+            "started": self.started,
+            "total_wall_seconds": self.wall_seconds,
+            "critical_path_seconds": seconds,
+            "critical_path": path,
+            **self.totals,
+            "tasks": [self.timings[name] for name in self.tasks if name in self.timings],
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    @classmethod
+    def combine(cls, name, dags):
+        """Merge several Dags into one; their tasks are renamed '<dag name>.<task name>' and keep their own log functions."""
+        combined = cls(name)
+        for dag in dags:
+            for task in dag.tasks.values():
+                combined.add(task.renamed(dag.name + "."))
+        return combined
@@ -0,0 +1,120 @@
+"""
+Cross-source deduplication of extracted rows.
+
+The same record can arrive in several source files (the CSV, JSON and XML drops often overlap), and concatenating them loads it more than once.
+Rows are compared on normalized keys: text is stripped, whitespace collapsed and case folded, and numeric keys with a tolerance are bucketed
+on a grid of that step (round(value / tolerance)), so 68.7 and 68.7004 are equal for a tolerance of 0.01. The first occurrence of every key is kept.
+This is grid bucketing, not a distance test: two values closer than the tolerance that round to neighbouring multiples (68.704 and 68.706)
+stay different. Matching them would need a comparison across buckets, which the hash-based grouping here cannot do in one pass.
+- deduplicate() works on one DataFrame in memory: pandas' duplicated() groups the normalized keys in a hash table in one pass.
+- duplicate_mask() is for inputs that do not fit in memory. A first pass over the chunks writes only the normalized keys, the row number and the source
+  of every row to one of partitions spill files on disk, chosen by the hash of the keys, so equal keys always land in the same partition.
+  Each partition is then deduplicated on its own, and the result is a boolean mask over all rows (one byte per row) that a second pass applies
+  to the chunks as they are read again, so the output keeps the input order.
+Both report the rows in and out and the duplicates removed per source.
+"""
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+
+partitions = 16  # spill files of duplicate_mask()
+
+
+def normalize_keys(df, keys, tolerances=None):
+    """Return a DataFrame of the normalized key columns of df; the keys in tolerances become the index of their grid bucket."""
+    tolerances = tolerances or {}
+    columns = {}
+    for key in keys:
+        series = df[key]
+        if key in tolerances:
+            columns[key] = (pd.to_numeric(series, errors="coerce") / tolerances[key]).round()
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            columns[key] = series
+        else:
+            columns[key] = series.astype("string").str.strip().str.replace(r"\s+", " ", regex=True).str.casefold()
+    return pd.DataFrame(columns, index=df.index)
+
+
+def dedup_report(rows_in, removed, sources):
+    """removed: the number of duplicates removed per source, in the order of sources."""
+    return {"rows_in": int(rows_in), "rows_out": int(rows_in - sum(removed)), "duplicates": int(sum(removed)),
+            "by_source": {source: int(count) for source, count in zip(sources, removed)}}
+
+
+def deduplicate(df, keys, tolerances=None, sources=None):
+    """
+    Drop the rows of df whose normalized keys were seen in an earlier row and return (deduplicated df, report).
+    sources labels every row with the source it came from (array-like, aligned with df) for the per-source counts.
+    """
+    duplicate = normalize_keys(df, keys, tolerances).duplicated(keep="first").to_numpy()
+    labels = pd.Categorical(["all"] * len(df) if sources is None else sources)
+    removed = np.bincount(labels.codes[duplicate], minlength=len(labels.categories))
+    return df[~duplicate], dedup_report(len(df), removed, list(labels.categories))
+
+
+def deduplicate_frames(frames, sources, keys, tolerances=None):
+    """
+    Concatenate frames (one per source, in order) with a fresh index and deduplicate them across sources.
+    sources should be full source ids (paths or archive::member names); frames given the same source are counted together.
+    """
+    data = pd.concat(frames, ignore_index=True)
+    categories = pd.Index(sources).unique()
+    codes = np.repeat(categories.get_indexer(sources), [len(frame) for frame in frames])
+    labels = pd.Categorical.from_codes(codes, categories=categories)
+    data, report = deduplicate(data, keys, tolerances, labels)
+    return data.reset_index(drop=True), report
+
+
+def read_pieces(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def duplicate_mask(chunks, keys, tolerances=None, partitions=partitions, spill_dir=None):
+    """
+    chunks yields (source, DataFrame) pairs. Return (keep, report): keep[i] is False when row i of the concatenated chunks
+    repeats the normalized keys of an earlier row. Only the keys are spilled to disk, in a temporary folder under spill_dir.
+    """
+    sources, offset = [], 0
+    with tempfile.TemporaryDirectory(prefix="dedup_", dir=spill_dir) as directory:
+        paths = [os.path.join(directory, f"part-{i}.pkl") for i in range(partitions)]
+        files = [open(path, "wb") for path in paths]
+        try:
+            for source, chunk in chunks:
+                if source not in sources:
+                    sources.append(source)
+                normalized = normalize_keys(chunk, keys, tolerances)
+                partition = pd.util.hash_pandas_object(normalized, index=False).to_numpy() % partitions
+                normalized["_row"] = np.arange(offset, offset + len(chunk))
+                normalized["_source"] = sources.index(source)
+                for number, piece in normalized.groupby(partition, sort=False):
+                    pickle.dump(piece, files[number], protocol=pickle.HIGHEST_PROTOCOL)
+                offset += len(chunk)
+        finally:
+            for f in files:
+                f.close()
+
+        keep = np.ones(offset, dtype=bool)
+        removed = np.zeros(len(sources), dtype=np.int64)
+        for path in paths:
+            pieces = list(read_pieces(path))
+            if not pieces:
+                continue
+            # the pieces were written in row order, so the first of equal keys is the earliest row
+            part = pd.concat(pieces, ignore_index=True)
+            duplicate = part.duplicated(subset=list(keys), keep="first").to_numpy()
+            keep[part["_row"].to_numpy()[duplicate]] = False
+            removed += np.bincount(part["_source"].to_numpy()[duplicate], minlength=len(sources))
+    return keep, dedup_report(offset, removed, sources)
+
+
+def describe_dedup(report):
+    """One-line summary of a deduplication report for the log."""
+    by_source = ", ".join(f"{source}: {count}" for source, count in report["by_source"].items() if count) or "none"
+    return f"Removed {report['duplicates']} duplicate rows of {report['rows_in']}, {report['rows_out']} left (per source: {by_source})"
@@ -0,0 +1,79 @@
+"""
+Memory-compact dtypes for the extracted DataFrames.
+
+pandas keeps every string column as one Python object per cell and every number as 64 bits, whatever the data.
+optimize_dtypes() runs once on a freshly extracted frame, before transform:
+- object columns holding only numbers (as can happen after pd.concat with an empty frame) are parsed to numbers,
+- low-cardinality string columns (distinct values / rows <= category_ratio) become categoricals,
+- integers are downcast to the smallest integer type holding every value, and floats to float32 only when that round-trips exactly.
+Nothing is lost: every cell compares equal to the original after the conversion.
+It returns the new frame and a report with the memory before and after and the dtype changes, for the scripts to log.
+"""
+import numpy as np
+import pandas as pd
+
+category_ratio = 0.5  # at most one distinct value per two rows
+min_category_rows = 100  # smaller frames are not worth the categorical overhead
+
+
+def memory_usage(df):
+    """Return the bytes used by df including the Python string objects."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def parse_numeric_objects(series):
+    """Return series as numbers if every non-missing value of an object column is numeric, else unchanged."""
+    if series.dtype != object:
+        return series
+    values = series.dropna()
+    if len(values) == 0 or not values.map(lambda value: isinstance(value, (int, float, np.number)) and not isinstance(value, bool)).all():
+        return series
+    return pd.to_numeric(series)
+
+
+def downcast_numeric(series):
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_integer_dtype(series.dtype) and isinstance(series.dtype, np.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if series.dtype == np.float64:
+        narrow = series.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return narrow
+    return series
+
+
+def is_low_cardinality(series, category_ratio=category_ratio, min_rows=min_category_rows):
+    if len(series) < min_rows:
+        return False
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+        return False
+    return series.nunique(dropna=True) <= len(series) * category_ratio
+
+
+def optimize_dtypes(df, category_ratio=category_ratio, min_rows=min_category_rows, exclude=()):
+    """Return (optimized copy of df, report); columns in exclude are left as they are."""
+    before = memory_usage(df)
+    columns, changes = {}, {}
+    for column in df.columns:
+        series = df[column]
+        if column not in exclude:
+            series = parse_numeric_objects(series)
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                series = downcast_numeric(series)
+            elif is_low_cardinality(series, category_ratio, min_rows):
+                series = series.astype("category")
+        if series.dtype != df[column].dtype:
+            changes[column] = f"{df[column].dtype} -> {series.dtype}"
+        columns[column] = series
+    optimized = pd.DataFrame(columns, index=df.index)
+    report = {"bytes_before": before, "bytes_after": memory_usage(optimized), "changes": changes}
+    return optimized, report
+
+
+def describe_report(report):
+    """One-line summary of an optimize_dtypes() report for the log."""
+    before, after = report["bytes_before"], report["bytes_after"]
+    saved = 100 * (1 - after / before) if before else 0
+    changes = ", ".join(f"{column}: {change}" for column, change in report["changes"].items()) or "no changes"
+    return f"Memory {before / 2 ** 20:.2f} MiB -> {after / 2 ** 20:.2f} MiB ({saved:.0f}% saved; {changes})"
@@ -0,0 +1,124 @@
+"""
+Fast HTML table extraction shared by the scrapers.
+
+The scrapers used to parse the whole page with BeautifulSoup's html.parser, loop over every tr/td and pd.concat a one-row DataFrame per row.
+extract_table() instead streams the page through lxml's incremental HTML parser, collects the wanted cells of the located table into one list per column,
+and stops parsing as soon as the table ends or the row limit is reached. The DataFrame is built once, and the per-column cleaners run on whole columns.
+When lxml is not installed the same extraction runs on BeautifulSoup with html.parser.
+
+The table locator is either an int, the position of the table body among all <tbody> elements of the page (the same as data.find_all('tbody')[index]),
+or a str, a class name of the table (the same as data.find('table', {'class': name})).
+"""
+import io
+import pandas as pd
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+def cell_text(cell):
+    """Text of a cell with runs of whitespace collapsed, like get_text() on the cell followed by strip()."""
+    return " ".join("".join(cell.itertext()).split())
+
+
+def link_text(cell):
+    """Text of the first link in the cell, or None when the cell has no link."""
+    link = cell.find(".//a")
+    return None if link is None else cell_text(link)
+
+
+def iter_rows_lxml(html, table):
+    """Yield the list of td elements of each row of the located table, parsing only as far as needed."""
+    source = io.BytesIO(html.encode("utf-8") if isinstance(html, str) else html)
+    tbody_count = -1
+    target = None
+    nested = 0
+    for event, elem in etree.iterparse(source, events=("start", "end"), html=True, encoding="utf-8"):
+        tag = elem.tag if isinstance(elem.tag, str) else ""
+        if target is None:
+            if event != "start":
+                continue
+            if isinstance(table, int) and tag == "tbody":
+                tbody_count += 1
+                if tbody_count == table:
+                    target = elem
+            elif isinstance(table, str) and tag == "table" and table in elem.get("class", "").split():
+                target = elem
+            continue
+        if elem is target and event == "end":
+            return
+        if tag == "table":
+            nested += 1 if event == "start" else -1
+        elif tag == "tr" and event == "end" and nested == 0:
+            yield [child for child in elem if child.tag == "td"]
+            elem.clear()
+            parent = elem.getparent()
+            while elem.getprevious() is not None:  # drop finished rows so the tree stays small
+                del parent[0]
+
+
+def iter_rows_bs4(html, table):
+    from bs4 import BeautifulSoup
+
+    class Cell:
+        # gives bs4 tags the itertext()/find() interface used by cell_text() and link_text()
+        def __init__(self, tag):
+            self.tag = tag
+
+        def itertext(self):
+            return self.tag.strings
+
+        def find(self, path):
+            link = self.tag.find("a")
+            return None if link is None else Cell(link)
+
+    data = BeautifulSoup(html, "html.parser")
+    if isinstance(table, int):
+        located = data.find_all("tbody")[table]
+    else:
+        located = data.find("table", {"class": table})
+    owner = located if located.name == "table" else located.find_parent("table")
+    for row in located.find_all("tr"):
+        if row.find_parent("table") is not owner:
+            continue  # row of a nested table
+        yield [Cell(td) for td in row.find_all("td", recursive=False)]
+
+
+def extract_table(html, table, columns, cleaners=None, limit=None, link_columns=(), backend="auto"):
+    """
+    Extract one table of an HTML page into a DataFrame.
+
+    columns maps output column names to td positions within a row. Rows without td cells (header rows) are skipped.
+    link_columns lists output columns whose cell must contain a link; the link text is used and rows without a link are skipped.
+    cleaners maps output column names to functions applied to the whole column (a Series) after extraction.
+    limit stops extraction after that many rows have been collected.
+    """
+    if backend == "auto":
+        backend = "lxml" if etree is not None else "bs4"
+    rows = iter_rows_lxml(html, table) if backend == "lxml" else iter_rows_bs4(html, table)
+
+    values = {name: [] for name in columns}
+    needed = max(columns.values()) + 1
+    collected = 0
+    for cells in rows:
+        if len(cells) < needed:
+            continue  # header rows have no td cells
+        row = {}
+        for name, position in columns.items():
+            row[name] = link_text(cells[position]) if name in link_columns else cell_text(cells[position])
+        if any(row[name] is None for name in link_columns):
+            continue
+        for name in columns:
+            values[name].append(row[name])
+        collected += 1
+        if limit is not None and collected >= limit:
+            break
+    if hasattr(rows, "close"):
+        rows.close()
+
+    df = pd.DataFrame(values, columns=list(columns))
+    for name, cleaner in (cleaners or {}).items():
+        df[name] = cleaner(df[name])
+    return df
@@ -0,0 +1,163 @@
+"""
+On-disk HTTP response cache for the scrapers' fetches.
+
+The archived pages on web.archive.org never change, yet every run downloaded them again and failed whenever the archive server timed out.
+HttpCache keeps response bodies in a content-addressed store (objects/<sha256 of the body>) with a small JSON index entry per URL holding the ETag, Last-Modified, fetch time, encoding
+and the final URL after redirects (web.archive.org redirects a requested date to the closest capture).
+A fresh entry is served without any network round trip; a stale one is revalidated with If-None-Match / If-Modified-Since, and a 304 answer only refreshes the entry.
+If the server cannot be reached, a stale entry is served instead of failing. In offline mode nothing is fetched and a URL that is not cached raises OfflineCacheMiss.
+The cache folders are only created when the first response is stored, so the scripts can build their HttpCache at import time without touching the disk.
+All requests go through one pooled requests.Session with retries.
+"""
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+course_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cache_dir = os.path.join(course_dir, ".http_cache")
+default_ttl = 24 * 60 * 60  # seconds before a cached response is revalidated
+# per-URL-prefix TTLs; None never expires. Archive snapshots are immutable.
+default_ttls = {"https://web.archive.org/web/": None}
+timeout = 60
+
+_session = None
+
+
+class OfflineCacheMiss(LookupError):
+    pass
+
+
+def shared_session():
+    """Return the process-wide pooled session used for every fetch."""
+    global _session
+    if _session is None:
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+        _session = requests.Session()
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class HttpCache:
+    def __init__(self, cache_dir=cache_dir, default_ttl=default_ttl, ttls=None, offline=False, session=None):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.ttls = dict(default_ttls if ttls is None else ttls)
+        self.offline = offline
+        self.session = session
+
+    def ttl_for(self, url):
+        # the longest matching prefix wins
+        for prefix in sorted(self.ttls, key=len, reverse=True):
+            if url.startswith(prefix):
+                return self.ttls[prefix]
+        return self.default_ttl
+
+    def index_path(self, url):
+        return os.path.join(self.cache_dir, "index", sha256(url.encode("utf-8")) + ".json")
+
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest)
+
+    def read_entry(self, url):
+        try:
+            with open(self.index_path(url)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.object_path(entry["object"])):
+            return None
+        return entry
+
+    def write_entry(self, url, entry):
+        write_atomic(self.index_path(url), json.dumps(entry).encode("utf-8"))
+
+    def read_object(self, entry):
+        with open(self.object_path(entry["object"]), "rb") as f:
+            return f.read()
+
+    def is_fresh(self, url, entry):
+        ttl = self.ttl_for(url)
+        return ttl is None or time.time() - entry["fetched_at"] < ttl
+
+    def fetch_entry(self, url):
+        """Return (body, cache entry) for url, using the network only when needed."""
+        entry = self.read_entry(url)
+        if entry is not None and (self.offline or self.is_fresh(url, entry)):
+            return self.read_object(entry), entry
+        if self.offline:
+            raise OfflineCacheMiss(f"{url} is not in the cache at {self.cache_dir}")
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = (self.session or shared_session()).get(url, headers=headers, timeout=timeout)
+        except requests.RequestException:
+            if entry is not None:
+                return self.read_object(entry), entry  # serve the stale copy while the server is unreachable
+            raise
+
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+            self.write_entry(url, entry)
+            return self.read_object(entry), entry
+        response.raise_for_status()
+
+        body = response.content
+        digest = sha256(body)
+        if not os.path.exists(self.object_path(digest)):
+            write_atomic(self.object_path(digest), body)
+        entry = {
+            "url": url,
+            "object": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "final_url": response.url,
+            "fetched_at": time.time(),
+        }
+        self.write_entry(url, entry)
+        return body, entry
+
+    def fetch(self, url):
+        """Return the response body as bytes."""
+        return self.fetch_entry(url)[0]
+
+    def fetch_text(self, url):
+        """Return the response body decoded like requests' response.text."""
+        body, entry = self.fetch_entry(url)
+        return body.decode(entry.get("encoding") or "utf-8", errors="replace")
+
+    def fetch_page(self, url):
+        """Return (text, final URL): the body as fetch_text() returns it and the URL the request was redirected to (url itself for old cache entries)."""
+        body, entry = self.fetch_entry(url)
+        return body.decode(entry.get("encoding") or "utf-8", errors="replace"), entry.get("final_url") or url
+
+    def open(self, path_or_url):
+        """Return a file-like object for a URL (through the cache) or the path itself for a local file, for pd.read_csv and friends."""
+        if path_or_url.startswith(("http://", "https://")):
+            return io.BytesIO(self.fetch(path_or_url))
+        return path_or_url
@@ -0,0 +1,124 @@
+"""
+Index building after the bulk loads.
+
+bulk_load() creates bare tables, so every filter, lookup or ORDER BY is a full table scan. build_indexes() runs after the load has been committed
+(building the indexes once over the loaded rows is much cheaper than maintaining them during the inserts), creates the indexes of an index spec,
+runs ANALYZE so the query planner knows the table's statistics, and reports the EXPLAIN QUERY PLAN of the workload queries before and after.
+
+An index spec is a list whose entries are a column name or a list of column names for a composite index, e.g. ["ID", ["CITY", "CCODE"]].
+infer_indexes() derives one from a query workload: the columns compared in WHERE clauses, the ones in ORDER BY, and JOIN keys, most used first.
+The workload can be read back from a job's log with workload_from_log(), since run_query logs every statement it runs.
+"""
+import re
+import sqlite3
+from collections import Counter
+from etl_common.logger import read_log
+from etl_common.query_cache import literal_pattern, normalize_sql, referenced_tables
+from etl_common.sqlite_loader import quote_identifier
+
+identifier = r'(?:"(?:[^"]|"")+"|[a-z_][a-z0-9_]*)'
+predicate_pattern = re.compile(rf"({identifier})\s*(?:=|==|<=|>=|<|>|\bin\b|\bbetween\b|\blike\b|\bis\b)")
+clause_pattern = re.compile(r"\b(where|order by|on)\b(.*?)(?=\b(?:group by|order by|limit|having|union|join|where)\b|$)")
+
+
+def normalize_spec(spec):
+    return [(entry,) if isinstance(entry, str) else tuple(entry) for entry in spec]
+
+
+def index_name(table_name, columns):
+    return "idx_" + "_".join(re.sub(r"\W+", "_", name) for name in (table_name, *columns))
+
+
+def table_columns(conn, table_name):
+    return {row[1].lower(): row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")}
+
+
+def unquote(name):
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name
+
+
+def query_columns(query):
+    """Return the columns the query filters, sorts or joins on, in order of appearance."""
+    # string literals are blanked out so that words inside them are not taken for columns
+    text = "".join("''" if i % 2 and part.startswith("'") else part
+                   for i, part in enumerate(literal_pattern.split(normalize_sql(query))))
+    columns = []
+    for clause, body in clause_pattern.findall(text):
+        if clause == "order by":
+            columns += [unquote(term.split()[0]) for term in body.split(",") if term.strip()]
+        else:
+            columns += [unquote(name) for name in predicate_pattern.findall(body)]
+    return columns
+
+
+def infer_indexes(conn, table_name, queries, max_indexes=3):
+    """Return an index spec of single-column indexes for the columns of table_name used most by queries on it."""
+    known = table_columns(conn, table_name)
+    counts = Counter()
+    for query in queries:
+        if table_name.lower() in referenced_tables(normalize_sql(query)):
+            counts.update(known[column.lower()] for column in query_columns(query) if column.lower() in known)
+    return [column for column, _ in counts.most_common(max_indexes)]
+
+
+def workload_from_log(log_file, phase="run_query"):
+    """Return the SQL statements logged under phase in a JSON-lines log written by etl_common.logger."""
+    try:
+        log = read_log(log_file)
+    except (OSError, ValueError):
+        return []
+    if log.empty or "phase" not in log:
+        return []
+    messages = log.loc[log["phase"] == phase, "message"].dropna()
+    return list(dict.fromkeys(m for m in messages if normalize_sql(m).startswith(("select", "with"))))
+
+
+def query_plan(conn, query):
+    """Return the EXPLAIN QUERY PLAN details of query as one string; ? parameters are bound to NULL."""
+    placeholders = sum(part.count("?") for i, part in enumerate(literal_pattern.split(query)) if i % 2 == 0)
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", [None] * placeholders).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def build_indexes(conn, table_name, spec, queries=()):
+    """
+    Create the indexes of spec on table_name (if missing), ANALYZE it, and return a report:
+    {"created": [index names], "plans": [{"query", "before", "after"}, ...]} for the queries that read the table.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    before = {}
+    for query in queries:
+        if table_name.lower() in referenced_tables(normalize_sql(query)):
+            try:
+                before[query] = query_plan(conn, query)
+            except sqlite3.Error:
+                pass  # a logged query that no longer fits the table, e.g. a dropped column
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? COLLATE NOCASE", (table_name,))}
+    created = []
+    with conn:
+        for columns in dict.fromkeys(normalize_spec(spec)):
+            name = index_name(table_name, columns)
+            if name not in existing:
+                column_list = ", ".join(quote_identifier(column) for column in columns)
+                conn.execute(f"CREATE INDEX {quote_identifier(name)} ON {quote_identifier(table_name)} ({column_list})")
+                created.append(name)
+        conn.execute(f"ANALYZE {quote_identifier(table_name)}")
+    plans = [{"query": query, "before": plan, "after": query_plan(conn, query)} for query, plan in before.items()]
+    return {"created": created, "plans": plans}
+
+
+def index_table(conn, table_name, spec=(), log_file=None, infer=True):
+    """build_indexes() for spec plus, when infer is set, the indexes inferred from the queries logged in log_file."""
+    workload = workload_from_log(log_file) if log_file else []
+    if infer:
+        spec = list(spec) + infer_indexes(conn, table_name, workload)
+    return build_indexes(conn, table_name, spec, workload)
+
+
+def describe_plans(report):
+    """Summary lines of a build_indexes() report for the log."""
+    lines = [f"Indexes created: {', '.join(report['created']) or 'none'}"]
+    for plan in report["plans"]:
+        lines.append(f"{plan['query']} | before: {plan['before']} | after: {plan['after']}")
+    return lines
@@ -0,0 +1,138 @@
+"""
+Buffered, non-blocking structured logger shared by the ETL scripts.
+
+The old log_progress() functions opened the log file, appended one line and closed it again on every call, and each script used its own format.
+BufferedLogger keeps records in memory and a background thread appends them to the log file in batches, so logging per chunk or per file costs no file I/O on the calling thread.
+Every record is written as one JSON object per line with the fields timestamp, job, phase, message, rows and elapsed (seconds since the logger was created), so the logs can be loaded with read_log() for throughput analysis.
+Buffered records are flushed when the interpreter exits.
+Worker processes (ProcessPoolExecutor) have their own copy of every logger, and their exit skips the atexit flush, so what they log would be lost.
+Functions run in a pool are therefore wrapped with LoggedCall: in the worker, the records are collected instead of buffered and returned
+with the result, and replay_records() hands them to the parent's loggers, which write them with their original timestamps.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+import pandas as pd
+
+flush_interval = 1.0  # seconds between background flushes
+max_buffered = 1000  # flush early once this many records are waiting
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+_captured = None  # (log_file, job, record) of the records logged while a LoggedCall runs in this process
+
+
+class BufferedLogger:
+    def __init__(self, log_file, job, flush_interval=flush_interval, max_buffered=max_buffered):
+        self.log_file = log_file
+        self.job = job
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.started = time.perf_counter()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            # a forked worker process must not write records buffered by its parent
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def log(self, message, phase="", rows=None):
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "job": self.job,
+            "phase": phase,
+            "message": message,
+            "rows": None if rows is None else int(rows),
+            "elapsed": round(time.perf_counter() - self.started, 3),
+        }
+        if _captured is not None:
+            _captured.append((self.log_file, self.job, record))
+            return
+        self.append(record)
+
+    def append(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            waiting = len(self._buffer)
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name=f"log-{self.job}", daemon=True)
+                self._thread.start()
+        if waiting >= self.max_buffered:
+            self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return
+            lines = "".join(json.dumps(record) + "\n" for record in records)
+            with open(self.log_file, "a") as f:
+                f.write(lines)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _reset_after_fork(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = True
+
+
+def get_logger(log_file, job):
+    """Return the logger for (log_file, job), creating it on first use."""
+    key = (os.path.abspath(log_file), job)
+    with _loggers_lock:
+        if key not in _loggers:
+            _loggers[key] = BufferedLogger(log_file, job)
+        return _loggers[key]
+
+
+class LoggedCall:
+    """Picklable wrapper for a function run in a worker process: calling it returns (result, records logged during the call)."""
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        global _captured
+        _captured = []
+        try:
+            return self.func(*args, **kwargs), _captured
+        finally:
+            _captured = None
+
+
+def replay_records(records):
+    """Write records returned by a LoggedCall through the loggers of this process."""
+    for log_file, job, record in records:
+        get_logger(log_file, job).append(record)
+
+
+def read_log(log_file):
+    """Load a structured log file into a DataFrame, skipping lines written in the old plain-text formats."""
+    records = []
+    with open(log_file) as f:
+        for line in f:
+            if line.startswith("{"):
+                records.append(json.loads(line))
+    return pd.DataFrame(records, columns=["timestamp", "job", "phase", "message", "rows", "elapsed"])
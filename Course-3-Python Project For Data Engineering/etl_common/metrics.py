@@ -0,0 +1,118 @@
+"""
+Per-phase profiling for the ETL jobs.
+
+RunMetrics wraps the phases of a job (extract, transform, load_data/load_to_csv/load_to_db, run_query) and records for each one:
+wall time, CPU time, rows in and out, bytes read and written by the process, and, with trace_memory, peak Python memory.
+Memory is traced with tracemalloc, which records every allocation and slows allocation-heavy phases such as extract several times over,
+so it is off by default and the scripts turn it on with --trace-memory.
+write_report() saves the run as a JSON document, and when profile_dir is set every phase is also run under cProfile and dumped to <profile_dir>/<job>_<phase>.prof.
+Phases should not be nested, since the memory peak and I/O counters are measured for the whole process.
+"""
+import os
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def io_counters():
+    """Return (bytes_read, bytes_written) for this process so far, or (None, None) if unavailable."""
+    if psutil is not None:
+        counters = psutil.Process().io_counters()
+        return getattr(counters, "read_chars", counters.read_bytes), getattr(counters, "write_chars", counters.write_bytes)
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(":") for line in f)
+        return int(values["rchar"]), int(values["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def peak_rss():
+    """Return the peak resident memory of this process in bytes, or None if unavailable. Unlike tracemalloc it costs nothing while the job runs."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+    if psutil is not None:
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return None
+
+
+def count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    return None
+
+
+class RunMetrics:
+    def __init__(self, job, trace_memory=False, profile_dir=None):
+        self.job = job
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, rows_in=None):
+        """Measure the enclosed block; set rows_out (or rows_in) on the yielded record if known."""
+        record = {"phase": name, "rows_in": rows_in, "rows_out": None}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if self.profile_dir else None
+        read_before, written_before = io_counters()
+        wall_before, cpu_before = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_seconds"] = round(time.perf_counter() - wall_before, 6)
+            record["cpu_seconds"] = round(time.process_time() - cpu_before, 6)
+            read_after, written_after = io_counters()
+            record["bytes_read"] = None if read_before is None else read_after - read_before
+            record["bytes_written"] = None if written_before is None else written_after - written_before
+            record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                record["profile"] = os.path.join(self.profile_dir, f"{self.job}_{name}.prof")
+                profiler.dump_stats(record["profile"])
+            self.phases.append(record)
+
+    def track(self, name, func, *args, **kwargs):
+        """Call func(*args, **kwargs) as phase name; rows in/out are taken from the first DataFrame argument and the result."""
+        frames = [a for a in list(args) + list(kwargs.values()) if isinstance(a, pd.DataFrame)]
+        with self.phase(name, rows_in=count_rows(frames[0]) if frames else None) as record:
+            result = func(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+        return result
+
+    def report(self):
+        return {
+            "job": self.job,
+            "started": self.started,
+            "total_wall_seconds": round(sum(p["wall_seconds"] for p in self.phases), 6),
+            "phases": self.phases,
+        }
+
+    def write_report(self, path):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -0,0 +1,30 @@
+"""
+The ETL scripts of the course, importable as modules.
+
+Every script keeps its job steps under if __name__ == "__main__":, so importing it only defines its settings and functions.
+load_script() imports one by name; the benchmark suite and run_pipelines.py use it to call the steps or the build_dag() of each script.
+"""
+import os
+import sys
+import importlib.util
+
+course_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+scripts = {
+    "etl_pipeline": ("ETL Pipeline", "etl_code.py"),
+    "banks": ("ETL_Bank_Data", "banks_project.py"),
+    "gdp": ("ETL_GDP_Data", "etl_project_gdp.py"),
+    "instructor": ("Database", "db_code.py"),
+    "movies": ("Web Scraping", "webscraping_movies (1).py"),
+}
+
+
+def load_script(name):
+    """Import one of the ETL scripts as a module; their job steps only run under __main__."""
+    folder, file_name = scripts[name]
+    path = os.path.join(course_dir, folder, file_name)
+    sys.path.append(os.path.dirname(path))  # lets process-pool workers re-import the module
+    spec = importlib.util.spec_from_file_location(os.path.splitext(file_name)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
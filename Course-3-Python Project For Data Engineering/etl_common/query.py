@@ -0,0 +1,73 @@
+"""
+Chunked, streaming queries for the SQLite tables.
+
+pd.read_sql fetches the whole result into memory before returning it. iter_chunks() instead keeps one cursor open and fetches fixed-size batches with fetchmany,
+yielding one DataFrame per batch, so a result of any size is processed in constant memory.
+Values are passed as bound parameters (the ? placeholders of sqlite3), a row limit stops fetching once enough rows have been read,
+and a consumer that stops iterating early (break, or an exception) closes the cursor straight away.
+An empty result still yields one empty batch, so the column names are always known.
+read_query(), print_query() and export_csv() take an optional QueryCache (see query_cache.py) to serve repeated queries from memory.
+"""
+import pandas as pd
+
+chunk_size = 10000  # rows fetched per batch
+
+
+def iter_batches(conn, query, params=(), batch_size=chunk_size, limit=None):
+    """Yield (column names, list of row tuples) with at most batch_size rows each, and at most limit rows in total."""
+    cursor = conn.execute(query, params)
+    try:
+        columns = [description[0] for description in cursor.description or ()]
+        remaining, fetched = limit, False
+        while remaining is None or remaining > 0:
+            rows = cursor.fetchmany(batch_size if remaining is None else min(batch_size, remaining))
+            if not rows:
+                break
+            if remaining is not None:
+                remaining -= len(rows)
+            fetched = True
+            yield columns, rows
+        if not fetched:
+            yield columns, []
+    finally:
+        cursor.close()
+
+
+def iter_chunks(conn, query, params=(), chunk_size=chunk_size, limit=None):
+    """Yield the result as DataFrames of at most chunk_size rows, indexed by row number within the whole result."""
+    start = 0
+    for columns, rows in iter_batches(conn, query, params, chunk_size, limit):
+        yield pd.DataFrame.from_records(rows, columns=columns, index=pd.RangeIndex(start, start + len(rows)))
+        start += len(rows)
+
+
+def result_chunks(conn, query, params, chunk_size, limit, cache):
+    if cache is not None:
+        return cache.iter_chunks(conn, query, params, chunk_size, limit)
+    return iter_chunks(conn, query, params, chunk_size, limit)
+
+
+def read_query(conn, query, params=(), chunk_size=chunk_size, limit=None, cache=None):
+    """Return the whole (limited) result as one DataFrame, for results that are known to be small."""
+    chunks = list(result_chunks(conn, query, params, chunk_size, limit, cache))
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+
+
+def print_query(conn, query, params=(), chunk_size=chunk_size, limit=None, cache=None):
+    """Print the statement and its result chunk by chunk and return the number of rows printed."""
+    print(query if not params else f"{query} -- params: {tuple(params)}")
+    rows = 0
+    for chunk in result_chunks(conn, query, params, chunk_size, limit, cache):
+        print(chunk.to_string(header=rows == 0) if len(chunk) else chunk)
+        rows += len(chunk)
+    return rows
+
+
+def export_csv(conn, query, path, params=(), chunk_size=chunk_size, limit=None, cache=None):
+    """Write the result to a CSV file one chunk at a time and return the number of rows written."""
+    rows, first = 0, True
+    with open(path, "w", newline="") as f:
+        for chunk in result_chunks(conn, query, params, chunk_size, limit, cache):
+            chunk.to_csv(f, header=first, index=False)
+            rows, first = rows + len(chunk), False
+    return rows
@@ -0,0 +1,113 @@
+"""
+In-memory cache of query results, invalidated by table version.
+
+The same analytical queries run again after every load and from dashboards polling in between, and each run scans the table again.
+QueryCache keeps their results in memory, keyed by the normalized SQL text (whitespace collapsed, case folded outside quoted literals), the parameters and the row limit.
+Each entry also remembers the versions of the tables the query reads, taken from the etl_table_versions table that bulk_load() bumps on every load.
+A hit is only served while those versions are unchanged, so a new load invalidates the old results without any explicit call.
+Queries on tables that were never loaded through bulk_load(), and statements other than SELECT, are not cached.
+Entries are evicted least recently used first once the cached DataFrames exceed max_bytes, and a result larger than max_entry_bytes is streamed through without being kept.
+"""
+import re
+import threading
+from collections import OrderedDict
+from etl_common.query import chunk_size, iter_chunks
+from etl_common.sqlite_loader import table_versions
+
+max_bytes = 64 * 2 ** 20  # memory used by all cached results
+literal_pattern = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+table_pattern = re.compile(r"""\b(?:from|join)\s+(?:"((?:[^"]|"")+)"|([a-z_][a-z0-9_]*))""")
+
+
+def normalize_sql(query):
+    """Collapse whitespace and lower-case everything outside string literals and quoted identifiers."""
+    parts = literal_pattern.split(query.strip().rstrip(";"))
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part).lower() for i, part in enumerate(parts)).strip()
+
+
+def referenced_tables(normalized_query):
+    return sorted({(quoted.replace('""', '"') if quoted else plain).lower()
+                   for quoted, plain in table_pattern.findall(normalized_query)})
+
+
+def database_key(conn):
+    # the main database file; in-memory databases are only shared by their own connection
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path or f"memory:{id(conn)}"
+
+
+def frame_bytes(chunk):
+    return int(chunk.memory_usage(deep=True).sum())
+
+
+class QueryCache:
+    def __init__(self, max_bytes=max_bytes, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4 if max_entry_bytes is None else max_entry_bytes
+        self.entries = OrderedDict()  # key -> (table versions, chunks, size)
+        self.size = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != versions:
+                self.discard(key)  # the table was loaded again since
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def store(self, key, versions, chunks, size):
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (versions, chunks, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+
+    def iter_chunks(self, conn, query, params=(), chunk_size=chunk_size, limit=None):
+        """Like query.iter_chunks(), but served from memory while the tables the query reads are unchanged."""
+        normalized = normalize_sql(query)
+        tables = referenced_tables(normalized)
+        versions = table_versions(conn, tables) if normalized.startswith(("select", "with")) else {}
+        if not tables or len(versions) != len(tables):
+            yield from iter_chunks(conn, query, params, chunk_size, limit)
+            return
+
+        key = (database_key(conn), normalized, tuple(params), limit)
+        versions = tuple(sorted(versions.items()))
+        chunks = self.lookup(key, versions)
+        if chunks is not None:
+            self.hits += 1
+            for chunk in chunks:
+                yield chunk.copy()
+            return
+
+        self.misses += 1
+        kept, size = [], 0
+        for chunk in iter_chunks(conn, query, params, chunk_size, limit):
+            if kept is not None:
+                size += frame_bytes(chunk)
+                if size <= self.max_entry_bytes:
+                    kept.append(chunk.copy())
+                else:
+                    kept = None  # too large to keep, keep streaming only
+            yield chunk
+        if kept is not None:
+            self.store(key, versions, kept, size)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
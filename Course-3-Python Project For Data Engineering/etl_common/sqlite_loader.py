@@ -0,0 +1,234 @@
+"""
+High-throughput SQLite loader shared by the ETL scripts.
+
+DataFrame.to_sql with if_exists='replace' drops the table first and then inserts the rows, so a reader can see an empty or half-loaded table while the load runs.
+bulk_load() writes the rows into a staging table with prepared executemany inserts inside one transaction, then drops the old table and renames the staging table in the same transaction.
+Readers see either the old table or the complete new one, never anything in between.
+The journal_mode and synchronous pragmas are set for the duration of the load and restored afterwards.
+Every load also bumps the table's row in the etl_table_versions table in the same transaction, so caches of query results can tell when a table has changed.
+
+merge_load() is the incremental alternative keyed on the table's primary key columns: the incoming rows go to a temporary staging table,
+and only the rows that are new, changed or (optionally) gone are written to the target table, all in one transaction.
+connect() opens the connection the scripts' task graphs hand from task to task.
+"""
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# pragmas applied while a load runs; WAL lets readers keep reading the old table during the load
+load_pragmas = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+batch_size = 50000  # rows sent to executemany at a time
+version_table = "etl_table_versions"
+# merges also keep the temporary staging table in memory, so only the changed rows reach the disk
+merge_pragmas = {**load_pragmas, "temp_store": "MEMORY"}
+
+
+def connect(db_name):
+    """Open db_name for a Dag (see dag.py): the connection is passed between its worker threads, but only used by one task at a time."""
+    return sqlite3.connect(db_name, check_same_thread=False)
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sqlite_type(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return sqlite_type(dtype.categories.dtype)
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def infer_column_types(df):
+    return {column: sqlite_type(dtype) for column, dtype in df.dtypes.items()}
+
+
+def column_values(series):
+    """Return the column as a list of values sqlite3 can bind, with missing values as None."""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+        return series.tolist()  # plain numpy numbers; NaN is stored as NULL by SQLite
+    values = series.astype(str) if pd.api.types.is_datetime64_any_dtype(series.dtype) else series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def iter_row_batches(df, batch_size=batch_size):
+    """Yield lists of plain Python tuples ready for executemany."""
+    for start in range(0, len(df), batch_size):
+        part = df.iloc[start:start + batch_size]
+        yield list(zip(*(column_values(part[column]) for column in part.columns)))
+
+
+def apply_pragmas(conn, pragmas):
+    """Set the given pragmas and return their previous values."""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name} = {value}")
+    return previous
+
+
+def create_table_sql(table_name, column_types):
+    columns = ", ".join(f"{quote_identifier(c)} {t}" for c, t in column_types.items())
+    return f"CREATE TABLE {quote_identifier(table_name)} ({columns})"
+
+
+def insert_rows(conn, df, table_name, batch_size=batch_size):
+    columns = ", ".join(quote_identifier(c) for c in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    statement = f"INSERT INTO {quote_identifier(table_name)} ({columns}) VALUES ({placeholders})"
+    for rows in iter_row_batches(df, batch_size):
+        conn.executemany(statement, rows)
+
+
+def table_exists(conn, table_name):
+    query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE"  # SQLite table names ignore case
+    return conn.execute(query, (table_name,)).fetchone() is not None
+
+
+def bump_version(conn, table_name, rows_loaded):
+    """Increment the version of table_name (starting at 1) inside the caller's transaction."""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {version_table} "
+                 "(table_name TEXT PRIMARY KEY COLLATE NOCASE, version INTEGER NOT NULL, loaded_at TEXT, rows_loaded INTEGER)")
+    conn.execute(f"INSERT INTO {version_table} (table_name, version, loaded_at, rows_loaded) VALUES (?, 1, ?, ?) "
+                 "ON CONFLICT (table_name) DO UPDATE SET version = version + 1, loaded_at = excluded.loaded_at, rows_loaded = excluded.rows_loaded",
+                 (table_name, datetime.now().isoformat(timespec="seconds"), rows_loaded))
+
+
+def table_versions(conn, table_names):
+    """Return {table name: version} for the given tables; tables never loaded through bulk_load are missing."""
+    if not table_names or not table_exists(conn, version_table):
+        return {}
+    placeholders = ", ".join("?" for _ in table_names)
+    query = f"SELECT table_name, version FROM {version_table} WHERE table_name IN ({placeholders})"
+    return {name.lower(): version for name, version in conn.execute(query, list(table_names))}
+
+
+@contextmanager
+def load_transaction(conn, pragmas=None):
+    """
+    Run the block in one BEGIN IMMEDIATE transaction with the load pragmas set; roll back on any error.
+    If the caller already has a transaction open, the block runs in a SAVEPOINT inside it instead, so the caller decides when it is committed:
+    an error rolls back only the load, and the pragmas are left as they are (journal_mode cannot change inside a transaction).
+    """
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT etl_load")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK TO etl_load")
+            conn.execute("RELEASE etl_load")
+            raise
+        conn.execute("RELEASE etl_load")
+        return
+    previous_pragmas = apply_pragmas(conn, load_pragmas if pragmas is None else pragmas)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        apply_pragmas(conn, previous_pragmas)
+
+
+def load_types(df, column_types):
+    types = infer_column_types(df)
+    types.update(column_types or {})
+    return {column: types[column] for column in df.columns}
+
+
+def bulk_load(df, conn, table_name, if_exists="replace", column_types=None, pragmas=None, batch_size=batch_size):
+    """
+    Load df into table_name and return the number of rows written.
+
+    if_exists works like DataFrame.to_sql: 'replace' swaps in a freshly loaded table, 'append' adds the rows to the existing table (creating it if needed) and 'fail' raises ValueError if the table already exists.
+    column_types maps column names to SQLite types; columns that are not listed get a type inferred from their dtype.
+    """
+    if if_exists not in ("replace", "append", "fail"):
+        raise ValueError(f"'{if_exists}' is not valid for if_exists")
+    types = load_types(df, column_types)
+
+    with load_transaction(conn, pragmas):
+        exists = table_exists(conn, table_name)
+        if if_exists == "fail" and exists:
+            raise ValueError(f"Table '{table_name}' already exists.")
+        if if_exists == "replace":
+            staging_table = table_name + "__staging"
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(staging_table)}")
+            conn.execute(create_table_sql(staging_table, types))
+            insert_rows(conn, df, staging_table, batch_size)
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+            conn.execute(f"ALTER TABLE {quote_identifier(staging_table)} RENAME TO {quote_identifier(table_name)}")
+        else:
+            if not exists:
+                conn.execute(create_table_sql(table_name, types))
+            insert_rows(conn, df, table_name, batch_size)
+        bump_version(conn, table_name, len(df))
+    return len(df)
+
+
+def merge_load(df, conn, table_name, key, column_types=None, delete_missing=False, pragmas=None, batch_size=batch_size):
+    """
+    Merge df into table_name by the key column(s) and return {"inserted", "updated", "deleted", "unchanged"} row counts.
+
+    Rows whose key is not in the table are inserted, rows whose other columns differ are updated, and identical rows are not written at all.
+    With delete_missing, table rows whose key is not in df are deleted. The table is created if it does not exist yet.
+    Keys must be unique and not null in df. No index is created on the table: build the key index afterwards with build_indexes() (indexes.py),
+    so it is built once over the loaded rows and reported with the query plans.
+    """
+    key = [key] if isinstance(key, str) else list(key)
+    missing_columns = [column for column in key if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Key column(s) {missing_columns} not in the data")
+    if df[key].isna().any(axis=None):
+        raise ValueError(f"Null values in key column(s) {key}")
+    if df.duplicated(key).any():
+        raise ValueError(f"Duplicate keys in the data for {key}")
+    types = load_types(df, column_types)
+    staging_table = table_name + "__merge"
+    target, staging = quote_identifier(table_name), quote_identifier(staging_table)
+    key_list = ", ".join(quote_identifier(k) for k in key)
+    columns = [quote_identifier(column) for column in df.columns]
+    values = [column for column in columns if column not in {quote_identifier(k) for k in key}]
+    matches = " AND ".join(f"t.{quote_identifier(k)} = s.{quote_identifier(k)}" for k in key)
+
+    with load_transaction(conn, merge_pragmas if pragmas is None else pragmas):
+        if table_exists(conn, table_name):
+            # stage with the target's declared types, so both sides of the comparisons get the same type affinity
+            declared = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({target})")}
+            unknown = [column for column in df.columns if column not in declared]
+            if unknown:
+                raise ValueError(f"Column(s) {unknown} not in table '{table_name}'")
+            types = {column: declared[column] or types[column] for column in df.columns}
+        else:
+            conn.execute(create_table_sql(table_name, types))
+        # the incoming rows only go to a temporary table, so unchanged rows cost no writes to the database file
+        conn.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+        conn.execute(create_table_sql(staging_table, types).replace("CREATE TABLE", "CREATE TEMP TABLE", 1))
+        insert_rows(conn, df, staging_table, batch_size)
+        conn.execute(f"CREATE INDEX temp.{quote_identifier(staging_table + '_key')} ON {staging} ({key_list})")
+
+        # until the key index exists, SQLite builds a transient one for each join
+        updated = 0
+        if values:
+            assignments = ", ".join(f"{c} = s.{c}" for c in values)
+            differs = " OR ".join(f"t.{c} IS NOT s.{c}" for c in values)
+            updated = conn.execute(f"UPDATE {target} AS t SET {assignments} FROM {staging} AS s WHERE {matches} AND ({differs})").rowcount
+        inserted = conn.execute(f"INSERT INTO {target} ({', '.join(columns)}) SELECT {', '.join('s.' + c for c in columns)} "
+                                f"FROM {staging} AS s LEFT JOIN {target} AS t ON {matches} WHERE t.{quote_identifier(key[0])} IS NULL").rowcount
+        deleted = 0
+        if delete_missing:
+            deleted = conn.execute(f"DELETE FROM {target} AS t WHERE NOT EXISTS (SELECT 1 FROM {staging} AS s WHERE {matches})").rowcount
+        conn.execute(f"DROP TABLE temp.{staging}")
+        if inserted or updated or deleted:
+            bump_version(conn, table_name, inserted + updated + deleted)
+    return {"inserted": inserted, "updated": updated, "deleted": deleted, "unchanged": len(df) - inserted - updated}
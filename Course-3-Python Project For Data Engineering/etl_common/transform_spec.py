@@ -0,0 +1,57 @@
+"""
+Declarative unit conversions.
+
+A transform spec is a list of steps (plain dicts, so it can also live in a JSON file):
+    {"column": "height", "op": "multiply", "factor": 0.0254, "round": 2, "rename": "height_m"}
+op is one of multiply / divide / add / subtract and may be left out for a step that only rounds or renames.
+compile_spec() groups the steps by column once. When the compiled function runs, every source column with an op or a round is read once into a single float buffer,
+all of its steps are applied to that buffer in place (ufuncs with out=, so no temporary arrays) and the buffer is set back as the column.
+Columns that are only renamed keep their values and dtype; all renames are done in one rename at the end.
+"""
+import json
+import numpy as np
+
+ops = {"multiply": np.multiply, "divide": np.divide, "add": np.add, "subtract": np.subtract}
+
+
+def check_step(step):
+    if "column" not in step:
+        raise ValueError(f"Transform step without a column: {step}")
+    op = step.get("op")
+    if op is not None and op not in ops:
+        raise ValueError(f"Unknown transform op {op!r}, expected one of {', '.join(ops)}")
+    if op is not None and "factor" not in step:
+        raise ValueError(f"Transform step {op!r} on {step['column']!r} needs a factor")
+
+
+def compile_spec(spec):
+    """Return a function transform(df) applying every step of spec to df (modified in place) and returning it."""
+    steps = [dict(step) for step in spec]
+    plan = {}  # column -> [(ufunc, factor, decimals), ...] in spec order
+    renames = {}
+    for step in steps:
+        check_step(step)
+        if step.get("op") is not None or step.get("round") is not None:
+            plan.setdefault(step["column"], []).append((ops.get(step.get("op")), step.get("factor"), step.get("round")))
+        if step.get("rename"):
+            renames[step["column"]] = step["rename"]
+
+    def transform(df):
+        for column, actions in plan.items():
+            buffer = df[column].to_numpy(dtype=float, copy=True)
+            for ufunc, factor, decimals in actions:
+                if ufunc is not None:
+                    ufunc(buffer, factor, out=buffer)
+                if decimals is not None:
+                    np.round(buffer, decimals, out=buffer)
+            df[column] = buffer
+        return df.rename(columns=renames) if renames else df
+
+    transform.spec = steps
+    return transform
+
+
+def load_spec(path):
+    """Read a transform spec from a JSON file holding a list of steps."""
+    with open(path) as f:
+        return json.load(f)
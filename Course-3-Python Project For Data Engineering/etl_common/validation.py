@@ -0,0 +1,199 @@
+"""
+Declarative data-quality checks for the extracted tables.
+
+A schema is a list of rules, each one a dict:
+    {"column": "MC_USD_Billion", "check": "type", "type": "float"}            values that are not numbers
+    {"column": "MC_USD_Billion", "check": "range", "min": 0, "max": 10000}   numbers outside [min, max]
+    {"column": "Name", "check": "not_null"}                                   missing values
+    {"column": "Name", "check": "unique"}                                     repeated values (every occurrence after the first)
+    {"column": "Name", "check": "pattern", "regex": "[A-Z].*"}               strings not matching the whole regex
+    {"column": "CCODE", "check": "allowed", "values": ["CA", "US"]}          values outside the list
+    {"check": "row_count", "min": 10, "max": 10}                              the number of rows
+    {"check": "row_change", "max": 0.5}                                       relative change of the row count since the last passing run
+Every check is one whole-column operation (isna, comparisons, duplicated, str.fullmatch, isin), so there is no Python loop over the rows.
+A rule fails when its violations exceed max_violations (default 0) or, if given, when they exceed max_fraction of the rows.
+Schema.validate() returns a report with the violation count of every rule; run_validation() logs it, raises ValidationError if any rule failed,
+and otherwise remembers the row count in a small JSON state file for the next run's row_change check.
+validate_batch() applies only the column rules, for data that arrives in chunks.
+"""
+import os
+import json
+from datetime import datetime
+import pandas as pd
+
+column_checks = ("type", "range", "not_null", "unique", "pattern", "allowed")
+row_checks = ("row_count", "row_change")
+types = ("float", "integer", "numeric", "string", "bool")
+
+
+class ValidationError(ValueError):
+    def __init__(self, report):
+        failed = ", ".join(f"{result['rule']} ({result['violations']})" for result in report["rules"] if not result["passed"])
+        super().__init__(f"Validation failed: {failed}")
+        self.report = report
+
+
+def check_rule(rule):
+    check = rule.get("check")
+    if check not in column_checks + row_checks:
+        raise ValueError(f"Unknown check '{check}' in {rule}")
+    if check in column_checks and "column" not in rule:
+        raise ValueError(f"Rule {rule} needs a column")
+    if check == "type" and rule.get("type") not in types:
+        raise ValueError(f"Unknown type '{rule.get('type')}' in {rule}, expected one of {types}")
+    if check == "pattern" and "regex" not in rule:
+        raise ValueError(f"Rule {rule} needs a regex")
+    if check == "allowed" and "values" not in rule:
+        raise ValueError(f"Rule {rule} needs values")
+
+
+def rule_name(rule):
+    return f"{rule['column']} {rule['check']}" if "column" in rule else rule["check"]
+
+
+def as_numbers(series):
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    return pd.to_numeric(series.astype(object) if isinstance(series.dtype, pd.CategoricalDtype) else series, errors="coerce")
+
+
+def type_violations(series, kind):
+    present = series.notna()
+    if kind == "bool":
+        return int((present & ~series.isin([True, False])).sum())
+    if kind == "string":
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+            return 0
+        return int((present & series.astype(object).str.len().isna()).sum()) if series.dtype == object else int(present.sum())
+    numbers = as_numbers(series)
+    bad = present & numbers.isna()
+    if kind == "integer":
+        bad |= numbers.notna() & (numbers % 1 != 0)
+    return int(bad.sum())
+
+
+def column_violations(df, rule):
+    series = df[rule["column"]]
+    check = rule["check"]
+    if check == "type":
+        return type_violations(series, rule["type"])
+    if check == "not_null":
+        return int(series.isna().sum())
+    if check == "unique":
+        return int(series.dropna().duplicated().sum())
+    if check == "range":
+        numbers = as_numbers(series)
+        bad = pd.Series(False, index=series.index)
+        if rule.get("min") is not None:
+            bad |= numbers < rule["min"]
+        if rule.get("max") is not None:
+            bad |= numbers > rule["max"]
+        return int(bad.sum())
+    if check == "pattern":
+        matches = series.dropna().astype(str).str.fullmatch(rule["regex"])
+        return int((~matches.astype(bool)).sum())
+    return int((series.notna() & ~series.isin(rule["values"])).sum())  # allowed
+
+
+def row_violations(rule, rows, previous_rows):
+    if rule["check"] == "row_count":
+        return int((rule.get("min") is not None and rows < rule["min"]) or (rule.get("max") is not None and rows > rule["max"]))
+    if not previous_rows:
+        return 0  # nothing to compare with on the first run
+    return int(abs(rows - previous_rows) / previous_rows > rule["max"])
+
+
+class Schema:
+    def __init__(self, rules, max_violations=0):
+        """max_violations is the default threshold of the rules that set neither max_violations nor max_fraction."""
+        self.rules = [dict(rule) for rule in rules]
+        for rule in self.rules:
+            check_rule(rule)
+        self.max_violations = max_violations
+
+    def result(self, rule, violations, rows=None):
+        # rows is None for the row count rules, which have no fraction
+        fraction = None if rows is None else round(violations / rows, 6) if rows else 0.0
+        if "max_fraction" in rule and rows is not None:
+            threshold, passed = rule["max_fraction"], fraction <= rule["max_fraction"]
+        else:
+            threshold = rule.get("max_violations", self.max_violations)
+            passed = violations <= threshold
+        return {"rule": rule_name(rule), "violations": violations, "fraction": fraction, "threshold": threshold, "passed": passed}
+
+    def check_columns(self, df):
+        """Results of the column rules on df, e.g. one chunk of a streamed file."""
+        missing = [rule["column"] for rule in self.rules if rule["check"] in column_checks and rule["column"] not in df.columns]
+        if missing:
+            raise KeyError(f"Columns {sorted(set(missing))} are missing from the data")
+        return [self.result(rule, column_violations(df, rule), len(df)) for rule in self.rules if rule["check"] in column_checks]
+
+    def check_rows(self, rows, previous_rows=None):
+        """Results of the row count rules for a table of rows rows, previous_rows being the count of the last passing run."""
+        return [self.result(rule, row_violations(rule, rows, previous_rows)) for rule in self.rules if rule["check"] in row_checks]
+
+    def validate(self, df, previous_rows=None):
+        results = self.check_columns(df) + self.check_rows(len(df), previous_rows)
+        return validation_report(results, len(df), previous_rows)
+
+
+def validation_report(results, rows, previous_rows=None):
+    return {"rows": rows, "previous_rows": previous_rows, "passed": all(result["passed"] for result in results), "rules": results}
+
+
+def describe_validation(report):
+    """Summary lines of a validation report for the log: the outcome, then one line per rule with violations."""
+    failed = sum(not result["passed"] for result in report["rules"])
+    lines = [f"Validation {'passed' if report['passed'] else 'failed'}: {len(report['rules'])} rules, {failed} failed, {report['rows']} rows"]
+    for result in report["rules"]:
+        if not result["violations"]:
+            continue
+        status = "ok" if result["passed"] else "FAILED"
+        if result["fraction"] is None:
+            lines.append(f"{result['rule']}: {report['rows']} rows, previous run {report['previous_rows']} - {status}")
+        else:
+            lines.append(f"{result['rule']}: {result['violations']} violations ({result['fraction']:.2%}), threshold {result['threshold']} - {status}")
+    return lines
+
+
+def read_previous_rows(state_file):
+    if not state_file or not os.path.exists(state_file):
+        return None
+    with open(state_file) as f:
+        return json.load(f).get("rows")
+
+
+def save_rows(state_file, rows):
+    temp_file = state_file + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump({"rows": rows, "validated": datetime.now().isoformat(timespec="seconds")}, f)
+    os.replace(temp_file, state_file)
+
+
+def run_validation(df, schema, state_file=None, log=None):
+    """
+    Validate df against schema and return df unchanged, so it can sit between two steps of a job.
+    The report is passed line by line to log; a failed rule raises ValidationError, which stops the job before anything is loaded.
+    """
+    result = schema.validate(df, read_previous_rows(state_file))
+    if log is not None:
+        for line in describe_validation(result):
+            log(line)
+    if not result["passed"]:
+        raise ValidationError(result)
+    if state_file:
+        save_rows(state_file, len(df))
+    return df
+
+
+def validate_batch(df, schema, log=None):
+    """Check one chunk of a streamed input against the column rules of schema and return it; failures are logged and raise ValidationError."""
+    result = validation_report(schema.check_columns(df), len(df))
+    if not result["passed"]:
+        if log is not None:
+            for line in describe_validation(result):
+                log(line)
+        raise ValidationError(result)
+    return df
@@ -0,0 +1,123 @@
+"""
+Pluggable output writers for the load steps.
+
+CSV stores every value as text: the types are lost, nothing is compressed, and a reader has to parse every column of every row.
+write_output() writes a DataFrame in one of the registered formats:
+- "csv": pandas' to_csv, as before,
+- "parquet": typed columns, zstd compression, row groups of row_group_size rows with min/max statistics per column,
+  so readers can skip the row groups and columns they do not need,
+- "feather": the Arrow IPC format, compressed with zstd; the fastest to read back whole.
+With partition_by, the columnar formats write a directory instead of a file, one sub-folder per value (hive style, e.g. Year=1994/part-0.parquet),
+and the old directory (or a single file at the same path) is replaced. read_output() reads a file or partitioned directory back, optionally only some columns and filtered partitions.
+More formats can be added with register_writer(). The columnar formats need pyarrow.
+"""
+import os
+import shutil
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+compression = "zstd"
+row_group_size = 100000  # rows per Parquet row group; each group keeps min/max statistics per column
+extensions = {".csv": "csv", ".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+
+
+def require_pyarrow(output_format):
+    if pa is None:
+        raise ImportError(f"Writing {output_format} output needs pyarrow: pip install pyarrow")
+
+
+def output_path(path, output_format):
+    """path with the extension of output_format, e.g. Countries_by_GDP.csv -> Countries_by_GDP.parquet."""
+    extension = {"feather": ".feather"}.get(output_format, "." + output_format)
+    return os.path.splitext(path)[0] + extension
+
+
+def format_of(path):
+    return extensions.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def write_csv(df, path, index=False, partition_by=None, **options):
+    if partition_by:
+        raise ValueError("Partitioned output needs a columnar format (parquet or feather)")
+    df.to_csv(path, index=index)
+
+
+def clear_path(path):
+    """Remove the output of an earlier run at path, a partitioned directory or a single file, so switching between the two works."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)  # partitions of values that are gone would otherwise stay behind
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def write_dataset(df, path, file_format, file_options, partition_by, index, max_rows_per_group=None):
+    table = pa.Table.from_pandas(df, preserve_index=index)
+    clear_path(path)
+    extension = "parquet" if isinstance(file_format, ds.ParquetFileFormat) else "feather"
+    rows_per_group = {}
+    if max_rows_per_group:
+        rows_per_group = {"max_rows_per_group": max_rows_per_group, "min_rows_per_group": min(max_rows_per_group, len(df) or 1)}
+    ds.write_dataset(table, path, format=file_format, file_options=file_options, partitioning=list(partition_by), partitioning_flavor="hive",
+                     basename_template="part-{i}." + extension, existing_data_behavior="delete_matching", **rows_per_group)
+
+
+def write_parquet(df, path, index=False, partition_by=None, compression=compression, row_group_size=row_group_size):
+    require_pyarrow("parquet")
+    if partition_by:
+        file_format = ds.ParquetFileFormat()
+        write_dataset(df, path, file_format, file_format.make_write_options(compression=compression), partition_by, index, row_group_size)
+    else:
+        clear_path(path)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=index), path, compression=compression, row_group_size=row_group_size,
+                       write_statistics=True)
+
+
+def write_feather(df, path, index=False, partition_by=None, compression=compression, row_group_size=None):
+    require_pyarrow("feather")
+    if partition_by:
+        file_format = ds.IpcFileFormat()
+        write_dataset(df, path, file_format, file_format.make_write_options(compression=compression), partition_by, index)
+    else:
+        clear_path(path)
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=index), path, compression=compression, chunksize=row_group_size)
+
+
+writers = {"csv": write_csv, "parquet": write_parquet, "feather": write_feather}
+
+
+def register_writer(output_format, writer):
+    """writer(df, path, index=False, partition_by=None, **options) writes df to path."""
+    writers[output_format] = writer
+
+
+def write_output(df, path, output_format=None, index=False, partition_by=None, **options):
+    """Write df to path in output_format (by default taken from the extension of path) and return the path."""
+    output_format = output_format or format_of(path)
+    if output_format not in writers:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {sorted(writers)}")
+    writers[output_format](df, path, index=index, partition_by=partition_by, **options)
+    return path
+
+
+def read_output(path, columns=None, filters=None, output_format=None):
+    """
+    Read a file or partitioned directory written by write_output().
+    For the columnar formats only the given columns are read, and filters ([("Year", ">=", 2000)], the pyarrow filter syntax)
+    skips the partitions and Parquet row groups whose statistics rule them out.
+    """
+    output_format = output_format or format_of(path)
+    if output_format == "csv":
+        if filters:
+            raise ValueError("filters need a columnar format (parquet or feather)")
+        return pd.read_csv(path, usecols=columns)
+    require_pyarrow(output_format)
+    dataset = ds.dataset(path, format="parquet" if output_format == "parquet" else "ipc", partitioning="hive" if os.path.isdir(path) else None)
+    expression = pq.filters_to_expression(filters) if filters else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
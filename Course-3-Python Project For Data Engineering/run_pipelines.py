@@ -0,0 +1,53 @@
+"""
+Run the Course-3 ETL jobs together as one task graph.
+
+Every script declares its steps as a Dag in build_dag() (see etl_common/dag.py). This script combines the Dags of the selected jobs into one,
+so the tasks of different jobs run at the same time on a shared pool of worker threads, while each task still waits for the tasks it depends on.
+Page fetches, file reads and SQLite writes release the GIL, so the jobs overlap instead of running one after another.
+At the end the start, end and wall time of every task are printed with the critical path, the longest chain of dependent tasks,
+which is the shortest time the combined run could take. The same numbers are saved as JSON with --report.
+
+Usage:
+    python run_pipelines.py
+    python run_pipelines.py --pipelines banks gdp --workers 8 --report pipelines_report.json
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from etl_common.dag import Dag, workers
+from etl_common.pipelines import load_script, scripts
+
+
+def build_dag(names):
+    return Dag.combine("pipelines", [load_script(name).build_dag() for name in names])
+
+
+def print_report(report):
+    print(f"{'task':<32} {'start':>9} {'end':>9} {'wall s':>9} {'rows':>8}")
+    for timing in report["tasks"]:
+        rows = "" if timing["rows_out"] is None else timing["rows_out"]
+        print(f"{timing['task']:<32} {timing['start']:>9.3f} {timing['end']:>9.3f} {timing['wall_seconds']:>9.3f} {rows:>8}")
+    print(f"Total wall time: {report['total_wall_seconds']:.3f} s")
+    print(f"Critical path: {report['critical_path_seconds']:.3f} s ({' -> '.join(report['critical_path'])})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Course-3 ETL jobs concurrently as one task graph.")
+    parser.add_argument("--pipelines", nargs="+", choices=list(scripts), default=list(scripts))
+    parser.add_argument("--workers", type=int, default=workers, help="tasks running at the same time")
+    parser.add_argument("--report", help="JSON file for the task timings and the critical path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # etl_code.py extracts with a process pool; forking a process that runs other threads can copy a held lock, so the workers are spawned instead
+    multiprocessing.set_start_method("spawn", force=True)
+    dag = build_dag(args.pipelines)
+    dag.run(max_workers=args.workers)
+    print_report(dag.report())
+    if args.report:
+        dag.write_report(args.report)
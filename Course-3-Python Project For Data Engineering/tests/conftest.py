@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+course_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, course_dir)
+from etl_common.logger import get_logger
+from etl_common.pipelines import load_script
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    """Load one of the ETL scripts by its pipelines name, with its log written under tmp_path."""
+    def load(name):
+        module = load_script(name)
+        monkeypatch.setattr(module, "logger", get_logger(str(tmp_path / f"{name}_log.txt"), job=name))
+        return module
+    return load
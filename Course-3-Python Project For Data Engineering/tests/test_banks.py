@@ -0,0 +1,18 @@
+def bank_page(rows, bad=()):
+    cells = "".join(f"<tr><td>{i}</td><td>Bank {i}</td><td>{'n/a x' if i in bad else f'{2000 - i},5 [1]'}</td></tr>" for i in range(1, rows + 1))
+    return f"<html><body><table class='wikitable'><tbody><tr><th>Rank</th></tr>{cells}</tbody></table></body></html>"
+
+
+def test_unparsable_market_cap_is_replaced_by_the_next_bank(script):
+    banks = script("banks")
+    df = banks.parse_page(bank_page(12, bad={3}), banks.table_attribs)
+    assert len(df) == banks.top_banks
+    assert "Bank 3" not in df["Name"].tolist()
+    assert df["Name"].iloc[-1] == "Bank 11"
+    assert df["MC_USD_Billion"].iloc[0] == 19995.0
+
+
+def test_top_banks_pass_the_row_count_rule(script):
+    banks = script("banks")
+    df = banks.parse_page(bank_page(12, bad={3}), banks.table_attribs)
+    assert banks.schema.validate(df)["passed"]
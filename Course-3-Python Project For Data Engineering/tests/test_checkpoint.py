@@ -0,0 +1,72 @@
+import sqlite3
+import pandas as pd
+import pytest
+from etl_common.checkpoint import Checkpoints
+from etl_common.dag import Dag
+
+
+class Job:
+    """A small extract / connect / load / query / close graph that records which tasks ran."""
+    def __init__(self):
+        self.calls = []
+        self.fail_query = False
+
+    def extract(self):
+        self.calls.append("extract")
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+    def connect(self):
+        self.calls.append("connect")
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def load(self, df, conn):
+        self.calls.append("load")
+        df.to_sql("t", conn, index=False)
+
+    def query(self, conn):
+        self.calls.append("query")
+        if self.fail_query:
+            raise RuntimeError("query failed")
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+    def close(self, conn):
+        self.calls.append("close")
+        conn.close()
+
+    def dag(self):
+        dag = Dag("job")
+        dag.task("extract", self.extract)
+        dag.task("connect", self.connect)
+        dag.task("load", self.load, inputs=["extract", "connect"])
+        dag.task("query", self.query, inputs=["connect"], after=["load"])
+        dag.task("close", self.close, inputs=["connect"], after=["query"])
+        return dag
+
+
+def test_resume_after_a_completed_run_starts_a_new_run(tmp_path):
+    job = Job()
+    first = Checkpoints("job", str(tmp_path))
+    job.dag().run(max_workers=1, checkpoints=first)
+    job.calls.clear()
+    resumed = Checkpoints("job", str(tmp_path), resume=True)
+    assert not resumed.resumed and resumed.run_id != first.run_id
+    results = job.dag().run(max_workers=1, checkpoints=resumed)
+    assert job.calls == ["extract", "connect", "load", "query", "close"]
+    assert results["query"] == 3
+
+
+def test_resume_after_a_failure_restores_frames_and_reruns_side_effects(tmp_path):
+    job = Job()
+    job.fail_query = True
+    with pytest.raises(RuntimeError):
+        job.dag().run(max_workers=1, checkpoints=Checkpoints("job", str(tmp_path)))
+    job.calls.clear()
+    job.fail_query = False
+    resumed = Checkpoints("job", str(tmp_path), resume=True)
+    assert resumed.resumed
+    dag = job.dag()
+    results = dag.run(max_workers=1, checkpoints=resumed)
+    # the extracted frame comes from its checkpoint; the load runs again on the new connection, which is closed at the end
+    assert job.calls == ["connect", "load", "query", "close"]
+    assert dag.timings["extract"]["resumed"]
+    assert results["query"] == 3
@@ -0,0 +1,28 @@
+import time
+import pandas as pd
+from etl_common.dag import Dag
+
+
+def frame(rows):
+    return pd.DataFrame({"ID": range(rows)})
+
+
+def slow_frame(rows):
+    time.sleep(0.05)
+    return frame(rows)
+
+
+def test_threaded_report_has_the_run_metrics_fields(tmp_path):
+    dag = Dag("job")
+    dag.task("left", slow_frame, 3)
+    dag.task("right", slow_frame, 4)
+    dag.task("both", lambda left, right: pd.concat([left, right]), inputs=["left", "right"])
+    dag.run(max_workers=2)
+    report = dag.report()
+    timings = {timing["task"]: timing for timing in report["tasks"]}
+    assert timings["both"]["rows_in"] == 7 and timings["both"]["rows_out"] == 7
+    assert timings["left"]["rows_in"] is None
+    # left and right ran at the same time, so their I/O is only in the run's totals
+    assert timings["left"]["bytes_read"] is None and timings["right"]["bytes_written"] is None
+    assert {"bytes_read", "bytes_written", "peak_rss_bytes"} <= set(report)
+    assert report["peak_rss_bytes"] > 0
@@ -0,0 +1,25 @@
+import pandas as pd
+from etl_common.dedup import deduplicate_frames, duplicate_mask
+
+keys = ["name", "height", "weight"]
+tolerances = {"height": 0.01, "weight": 0.01}
+
+
+def people():
+    return pd.DataFrame({"name": ["Alex", "jack "], "height": [65.78, 71.52], "weight": [112.99, 136.49]})
+
+
+def test_members_with_the_same_file_name_are_counted_apart():
+    sources = ["source.zip::a/source1.csv", "source.zip::b/source1.csv"]
+    data, report = deduplicate_frames([people(), people()], sources, keys, tolerances)
+    assert len(data) == 2
+    assert report["by_source"] == {sources[0]: 0, sources[1]: 2}
+
+
+def test_spilled_mask_matches_the_in_memory_result(tmp_path):
+    other = pd.DataFrame({"name": ["ALEX", "Sam"], "height": [65.7800001, 60.0], "weight": [112.99, 100.0]})
+    frames, sources = [people(), other], ["source1.csv", "source1.json"]
+    data, report = deduplicate_frames(frames, sources, keys, tolerances)
+    keep, mask_report = duplicate_mask(zip(sources, frames), keys, tolerances, partitions=4, spill_dir=str(tmp_path))
+    assert keep.tolist() == [True, True, False, True]
+    assert report == mask_report and len(data) == 3
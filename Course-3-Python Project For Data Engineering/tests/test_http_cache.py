@@ -0,0 +1,92 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from etl_common.http_cache import HttpCache, OfflineCacheMiss
+
+last_modified = "Sat, 02 Sep 2023 18:56:55 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/etag answers with an ETag, /dated with a Last-Modified date; both answer 304 when the client already has them."""
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+            return self.send_not_modified()
+        if self.path == "/dated" and self.headers.get("If-Modified-Since") == last_modified:
+            return self.send_not_modified()
+        body = f"<table>{self.path}</table>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/etag":
+            self.send_header("ETag", '"v1"')
+        else:
+            self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self):
+        self.send_response(304)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_cache(tmp_path, **kwargs):
+    # a session without retries, so an unreachable server fails at once
+    return HttpCache(cache_dir=str(tmp_path / "cache"), ttls={}, session=requests.Session(), **kwargs)
+
+
+def test_creating_a_cache_does_not_touch_the_disk(tmp_path):
+    make_cache(tmp_path)
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_fresh_entry_is_served_without_a_request(server, tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.fetch_text(server.url + "/etag") == "<table>/etag</table>"
+    assert cache.fetch_text(server.url + "/etag") == "<table>/etag</table>"
+    assert len(server.requests) == 1
+
+
+@pytest.mark.parametrize("path, header, value", [("/etag", "If-None-Match", '"v1"'), ("/dated", "If-Modified-Since", last_modified)])
+def test_stale_entry_is_revalidated(server, tmp_path, path, header, value):
+    cache = make_cache(tmp_path, default_ttl=0)
+    first = cache.fetch_entry(server.url + path)[1]["fetched_at"]
+    body, entry = cache.fetch_entry(server.url + path)
+    assert body == f"<table>{path}</table>".encode()
+    assert server.requests[1][1][header] == value
+    assert entry["fetched_at"] >= first
+
+
+def test_stale_entry_is_served_when_the_server_is_down(server, tmp_path):
+    cache = make_cache(tmp_path, default_ttl=0)
+    url = server.url + "/etag"
+    cache.fetch(url)
+    server.shutdown()
+    server.server_close()
+    assert cache.fetch(url) == b"<table>/etag</table>"
+
+
+def test_offline_mode(server, tmp_path):
+    url = server.url + "/etag"
+    with pytest.raises(OfflineCacheMiss):
+        make_cache(tmp_path, offline=True).fetch(url)
+    make_cache(tmp_path).fetch(url)
+    assert make_cache(tmp_path, offline=True, default_ttl=0).fetch(url) == b"<table>/etag</table>"
+    assert len(server.requests) == 1
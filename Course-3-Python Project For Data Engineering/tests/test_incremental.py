@@ -0,0 +1,85 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def etl(script, tmp_path, monkeypatch):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    shipped = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ETL Pipeline")
+    for name in ["source1.csv", "source1.json", "source1.xml", "source2.csv", "source2.json", "source2.xml"]:
+        shutil.copy(os.path.join(shipped, name), source_dir)
+    module = script("etl_pipeline")
+    target_file = str(tmp_path / "out" / "transformed_data.csv")
+    os.makedirs(os.path.dirname(target_file))
+    monkeypatch.setattr(module, "source_dir", str(source_dir))
+    monkeypatch.setattr(module, "target_file", target_file)
+    monkeypatch.setattr(module, "manifest_file", module.manifest_path(target_file))
+    return module
+
+
+def full_rebuild(etl):
+    return etl.transform(pd.concat([etl.extract_file(f) for f in etl.list_source_files()], ignore_index=True))
+
+
+def read_target(etl):
+    return pd.read_csv(etl.target_file, index_col=0)
+
+
+def test_incremental_matches_full_rebuild_after_a_source_changes(etl):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    with open(os.path.join(etl.source_dir, "source2.json"), "a") as f:
+        f.write('{"name":"Zed","height":70.0,"weight":150.0}\n')
+    counts = etl.run_incremental(etl.target_file, etl.manifest_file)
+    assert counts == {"unchanged": 5, "changed": 1, "new": 0, "deleted": 0}
+    pd.testing.assert_frame_equal(read_target(etl), full_rebuild(etl))
+
+
+def test_unchanged_sources_leave_the_target_alone(etl):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    written = os.stat(etl.target_file).st_mtime_ns
+    assert etl.run_incremental(etl.target_file, etl.manifest_file)["unchanged"] == 6
+    assert os.stat(etl.target_file).st_mtime_ns == written
+
+
+def test_rewritten_target_forces_a_full_rebuild(etl, monkeypatch):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    with open(etl.manifest_file) as f:
+        manifest = f.read()
+    # a deduplicated batch run rewrites the target with fewer rows; a stale manifest is put back next to it
+    monkeypatch.setattr(etl, "deduplicate_sources", True)
+    etl.load_data(etl.target_file, etl.transform(etl.extract()))
+    assert not os.path.exists(etl.manifest_file)
+    with open(etl.manifest_file, "w") as f:
+        f.write(manifest)
+    monkeypatch.setattr(etl, "deduplicate_sources", False)
+    counts = etl.run_incremental(etl.target_file, etl.manifest_file)
+    assert counts["new"] == 6
+    pd.testing.assert_frame_equal(read_target(etl), full_rebuild(etl))
+
+
+def test_unchanged_run_reads_neither_the_target_nor_the_sources(etl, monkeypatch):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    opened = []
+    monkeypatch.setattr(etl, "hash_file", lambda path, *args: opened.append(path))
+    monkeypatch.setattr(etl.pd, "read_csv", lambda path, *args, **kwargs: opened.append(path))
+    assert etl.run_incremental(etl.target_file, etl.manifest_file)["unchanged"] == 6
+    assert opened == []
+
+
+def test_manifest_hash_is_the_hash_of_the_written_target(etl):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    target = etl.read_manifest(etl.manifest_file)["target"]
+    assert target["sha256"] == etl.hash_file(etl.target_file)
+    assert target["size"] == os.path.getsize(etl.target_file)
+
+
+def test_touched_target_is_hashed_instead_of_rebuilt(etl):
+    etl.run_incremental(etl.target_file, etl.manifest_file)
+    os.utime(etl.target_file, (0, 0))
+    os.remove(os.path.join(etl.source_dir, "source1.xml"))
+    counts = etl.run_incremental(etl.target_file, etl.manifest_file)
+    assert counts == {"unchanged": 5, "changed": 0, "new": 0, "deleted": 1}
+    pd.testing.assert_frame_equal(read_target(etl), full_rebuild(etl))
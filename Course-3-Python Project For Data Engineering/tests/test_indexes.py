@@ -0,0 +1,28 @@
+import sqlite3
+import pandas as pd
+import pytest
+from etl_common.indexes import build_indexes
+from etl_common.sqlite_loader import merge_load
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    yield conn
+    conn.close()
+
+
+def test_key_index_of_a_merged_table_is_built_and_reported(conn):
+    query = "SELECT * FROM INSTRUCTOR WHERE ID = 2"
+    merge_load(pd.DataFrame({"ID": range(1000), "CITY": "Paris"}), conn, "INSTRUCTOR", "ID")
+    report = build_indexes(conn, "INSTRUCTOR", ["ID"], [query])
+    assert report["created"] == ["idx_INSTRUCTOR_ID"]
+    assert "idx_INSTRUCTOR_ID" not in report["plans"][0]["before"]
+    assert "idx_INSTRUCTOR_ID" in report["plans"][0]["after"]
+
+
+def test_merge_without_a_key_index(conn):
+    merge_load(pd.DataFrame({"ID": [1, 2], "CITY": ["Paris", "Lyon"]}), conn, "INSTRUCTOR", "ID")
+    counts = merge_load(pd.DataFrame({"ID": [2, 3], "CITY": ["Nice", "Lyon"]}), conn, "INSTRUCTOR", "ID", delete_missing=True)
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 0}
+    assert conn.execute("SELECT * FROM INSTRUCTOR ORDER BY ID").fetchall() == [(2, "Nice"), (3, "Lyon")]
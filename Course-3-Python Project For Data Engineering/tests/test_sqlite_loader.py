@@ -0,0 +1,32 @@
+import sqlite3
+import pandas as pd
+import pytest
+from etl_common.sqlite_loader import bulk_load
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    yield conn
+    conn.close()
+
+
+def test_load_inside_an_open_transaction_leaves_it_to_the_caller(conn):
+    conn.execute("CREATE TABLE audit (note TEXT)")
+    conn.commit()
+    conn.execute("INSERT INTO audit VALUES ('load started')")
+    bulk_load(pd.DataFrame({"ID": [1, 2]}), conn, "INSTRUCTOR")
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM audit").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'INSTRUCTOR'").fetchone()[0] == 0
+
+
+def test_failed_load_rolls_back_only_its_own_changes(conn):
+    bulk_load(pd.DataFrame({"ID": [1], "CITY": ["Paris"]}), conn, "INSTRUCTOR")
+    conn.execute("INSERT INTO INSTRUCTOR VALUES (2, 'Lyon')")
+    with pytest.raises(sqlite3.Error):
+        bulk_load(pd.DataFrame({"ID": [3], "CITY": [{"not": "bindable"}]}), conn, "INSTRUCTOR")
+    conn.commit()
+    assert conn.execute("SELECT ID FROM INSTRUCTOR ORDER BY ID").fetchall() == [(1,), (2,)]
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%staging'").fetchone()[0] == 0
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from etl_common.transform_spec import compile_spec
+
+
+def test_rename_only_steps_keep_values_and_dtypes():
+    transform = compile_spec([{"column": "name", "rename": "Name"}, {"column": "count", "rename": "Count"}])
+    df = transform(pd.DataFrame({"name": ["a", "b"], "count": [1, 2]}))
+    assert list(df.columns) == ["Name", "Count"]
+    assert df["Name"].tolist() == ["a", "b"]
+    assert pd.api.types.is_integer_dtype(df["Count"])
+
+
+def test_arithmetic_round_and_rename():
+    transform = compile_spec([{"column": "gdp", "op": "divide", "factor": 1000, "round": 2, "rename": "gdp_billions"}])
+    df = transform(pd.DataFrame({"gdp": [26854599, 1234]}))
+    assert df["gdp_billions"].tolist() == [26854.6, 1.23]
+
+
+def test_unknown_op_is_rejected():
+    with pytest.raises(ValueError):
+        compile_spec([{"column": "x", "op": "power", "factor": 2}])
@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+from etl_common import writers
+from etl_common.writers import read_output, write_output
+
+pytestmark = pytest.mark.skipif(writers.pa is None, reason="needs pyarrow")
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_switching_between_a_file_and_partitions(tmp_path, output_format):
+    path = str(tmp_path / f"out.{output_format}")
+    df = pd.DataFrame({"Year": [1994, 1995, 1995], "Film": ["a", "b", "c"]})
+    write_output(df, path)
+    write_output(df, path, partition_by=["Year"])
+    assert sorted(read_output(path)["Film"]) == ["a", "b", "c"]
+    write_output(df, path)
+    assert read_output(path).columns.tolist() == ["Year", "Film"]
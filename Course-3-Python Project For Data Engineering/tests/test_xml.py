@@ -0,0 +1,34 @@
+import xml.etree.ElementTree as ET
+import pandas as pd
+import pytest
+
+persons = [("simon", 67.9, 112.37), ("jacob", 66.78, 120.67), ("cindy", 66.49, 127.45), ("ivan", 72.71, 144.32), ("anna", 64.1, 98.0)]
+
+
+def per_person_extract(file_to_process):
+    """The lab's original extract_from_xml: ET.parse, then one pd.concat per person."""
+    dataframe = pd.DataFrame(columns=["name", "height", "weight"])
+    for person in ET.parse(file_to_process).getroot():
+        row = {"name": person.find("name").text, "height": float(person.find("height").text), "weight": float(person.find("weight").text)}
+        dataframe = pd.concat([dataframe, pd.DataFrame([row])], ignore_index=True)
+    return dataframe
+
+
+@pytest.fixture
+def xml_file(tmp_path):
+    path = tmp_path / "persons.xml"
+    rows = "".join(f"<person><name>{n}</name><height>{h}</height><weight>{w}</weight></person>\n" for n, h, w in persons)
+    path.write_text(f'<?xml version="1.0" encoding="UTF-8"?>\n<data>\n{rows}</data>\n')
+    return str(path)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 5, 50000])
+def test_batches_match_the_per_person_extractor(script, xml_file, monkeypatch, batch_size):
+    etl = script("etl_pipeline")
+    monkeypatch.setattr(etl, "xml_batch_size", batch_size)
+    pd.testing.assert_frame_equal(etl.extract_from_xml(xml_file), per_person_extract(xml_file), check_dtype=False)
+
+
+def test_batch_boundary(script, xml_file):
+    etl = script("etl_pipeline")
+    assert [len(batch) for batch in etl.iter_xml_batches(xml_file, batch_size=2)] == [2, 2, 1]